@@ -1,6 +1,10 @@
 from itertools import product
 from itertools import groupby
 from collections import deque
+from time import perf_counter
+
+from budget import current_budget
+from metrics import current_metrics
 
 def is_valid_line(line, clues):
     """Check if a line (row or column) satisfies the given clues."""
@@ -13,6 +17,8 @@ def solve_nonogram_bfs(column_clues, row_clues):
     states_explored = 0
     
     queue = deque([(grid, 0, 0)])  # (current grid, row index, col index)
+    metrics = current_metrics()
+    budget = current_budget()
     
     def is_valid(grid):
         """Check if the current grid satisfies all filled rows and columns."""
@@ -26,34 +32,51 @@ def solve_nonogram_bfs(column_clues, row_clues):
         return True
     
     while queue:
+        if metrics is not None:
+            metrics.frontier(len(queue))
         grid, r, c = queue.popleft()
         states_explored += 1
+        if budget is not None:
+            budget.tick()
         
         if r == rows:
-            if is_valid(grid):
+            start = perf_counter() if metrics is not None else 0
+            solved = is_valid(grid)
+            if metrics is not None:
+                metrics.goal_test_time += perf_counter() - start
+            if solved:
                 return grid, states_explored
             continue
         
         next_r, next_c = (r, c + 1) if c + 1 < cols else (r + 1, 0)
         
+        if metrics is not None:
+            metrics.nodes_expanded += 1
+            start = perf_counter()
         for val in (0, 1):
             new_grid = [row[:] for row in grid]  # Copy grid
             new_grid[r][c] = val
             if is_valid(new_grid):
                 queue.append((new_grid, next_r, next_c))
+            elif metrics is not None:
+                metrics.prune("completed line violates clue")
+        if metrics is not None:
+            metrics.consistency_checks += 2
+            metrics.successor_time += perf_counter() - start
     
     return None, states_explored  # No solution found
 
-# column_clues = [[1,1,1],[2,1],[3],[2],[2,1]]
-# row_clues = [[3,1],[2,1],[1,1],[1,2],[1,1]]
-column_clues = [[2],[3],[1,1],[0]]
-row_clues = [[1],[1],[2],[3]]
+if __name__ == "__main__":
+    # column_clues = [[1,1,1],[2,1],[3],[2],[2,1]]
+    # row_clues = [[3,1],[2,1],[1,1],[1,2],[1,1]]
+    column_clues = [[2],[3],[1,1],[0]]
+    row_clues = [[1],[1],[2],[3]]
 
-solution, states_explored = solve_nonogram_bfs(column_clues, row_clues)
-print("Solution:")
-if solution:
-    for row in solution:
-        print("".join("#" if cell == 1 else "_" for cell in row))
-else:
-    print("No solution found")
-print("Game states explored:", states_explored)
+    solution, states_explored = solve_nonogram_bfs(column_clues, row_clues)
+    print("Solution:")
+    if solution:
+        for row in solution:
+            print("".join("#" if cell == 1 else "_" for cell in row))
+    else:
+        print("No solution found")
+    print("Game states explored:", states_explored)
@@ -1,11 +1,34 @@
-import os, time
+import os, time, heapq
 from itertools import combinations
 import numpy as np 
-import matplotlib.pyplot as plt 
-from IPython.display import clear_output
+
+# matplotlib and IPython are only needed to show or save boards, and importing them
+# takes about a second, so they are imported on first use (see display_board/save_board).
+
+try:
+    from metrics import current_metrics
+except ImportError:  # metrics.py lives at the repository root
+    def current_metrics():
+        return None
+
+try:
+    from budget import current_budget
+except ImportError:  # budget.py lives at the repository root
+    def current_budget():
+        return None
+
+try:
+    from line_cache import line_candidates
+except ImportError:  # line_cache.py lives at the repository root
+    line_candidates = None
+
+try:
+    from frame_sink import FrameSink
+except ImportError:  # frame_sink.py lives at the repository root
+    FrameSink = None
 
 class NonogramSolver:
-    def __init__(self, ROWS_VALUES=[[2], [4], [6], [4, 3], [5, 4], [2, 3, 2], [3, 5], [5], [3], [2], [2], [6]], COLS_VALUES=[[3], [5], [3, 2, 1], [5, 1, 1], [12], [3, 7], [4, 1, 1, 1], [3, 1, 1], [4], [2]], savepath=''):
+    def __init__(self, ROWS_VALUES=[[2], [4], [6], [4, 3], [5, 4], [2, 3, 2], [3, 5], [5], [3], [2], [2], [6]], COLS_VALUES=[[3], [5], [3, 2, 1], [5, 1, 1], [12], [3, 7], [4, 1, 1, 1], [3, 1, 1], [4], [2]], savepath='', show=True):
         self.ROWS_VALUES = ROWS_VALUES
         self.no_of_rows = len(ROWS_VALUES)
         self.rows_changed = [0] * self.no_of_rows
@@ -21,42 +44,172 @@ class NonogramSolver:
         self.board = [[0 for c in range(self.no_of_cols)] for r in range(self.no_of_rows)]
         self.savepath = savepath
         if self.savepath != '': self.n = 0
+        self.show = show
+        # A savepath ending in .npz/.gif is one animation file, encoded on a background
+        # thread; any other savepath is a directory that gets one JPEG per step.
+        self.sink = None
+        if self.savepath.endswith(('.npz', '.gif')):
+            if FrameSink is None:
+                raise ImportError('frame_sink.py is needed to write .npz/.gif animations')
+            self.sink = FrameSink(self.savepath)
 
         # step 1: Defining all possible solutions for every row and col
         self.rows_possibilities = self.create_possibilities(ROWS_VALUES, self.no_of_cols)
         self.cols_possibilities = self.create_possibilities(COLS_VALUES, self.no_of_rows)
         
-        while not self.solved:
-            # step 2: Order indici by lowest 
-            self.lowest_rows = self.select_index_not_done(self.rows_possibilities, 1)
-            self.lowest_cols = self.select_index_not_done(self.cols_possibilities, 0)
-            self.lowest = sorted(self.lowest_rows + self.lowest_cols, key=lambda element: element[1])
+        # Changes made while probing are recorded on this trail so they can be undone.
+        self.trail = []
+        self.probing = False
+        self.stalled = False
+        # Lines taken off the queue and propagated, including during probes.
+        self.states_explored = 0
+        self.solve()
+
+    def solve(self):
+        # steps 2-3: line propagation; step 4: probing once propagation stalls
+        self.queue = []
+        for i in range(self.no_of_rows): self.enqueue(1, i)
+        for i in range(self.no_of_cols): self.enqueue(0, i)
+        try:
+            while not self.solved:
+                if not self.propagate():
+                    raise ValueError('The row and column clues are contradictory')
+                if self.solved: break
+                if not self.probe():
+                    # Neither propagation nor probing can fix another cell: only full backtracking could.
+                    self.stalled = True
+                    break
+        finally:
+            if self.sink is not None: self.sink.close()
+
+    def enqueue(self, row_ind, idx):
+        # Queue a line whose possibilities changed, ordered by its number of possibilities.
+        # A line may sit in the queue several times; only the entry matching its
+        # current count is processed (see propagate).
+        if self.check_done(row_ind, idx): return
+        if row_ind:
+            self.rows_changed[idx] = 1
+            count = len(self.rows_possibilities[idx])
+        else:
+            self.cols_changed[idx] = 1
+            count = len(self.cols_possibilities[idx])
+        heapq.heappush(self.queue, (count, row_ind, idx))
+
+    def propagate(self):
+        # Process queued lines, fewest possibilities first, until the queue is empty.
+        # Fixing a cell re-queues only the crossing line, so the work is proportional
+        # to the changes made. Returns False on a contradiction.
+        metrics = current_metrics()
+        budget = current_budget()
+        while self.queue:
+            if metrics is not None: metrics.frontier(len(self.queue))
+            count, row_ind, ind1 = heapq.heappop(self.queue)
+            # step 2: take the line with the lowest number of possibilities
+            if row_ind:
+                if not self.rows_changed[ind1] or count != len(self.rows_possibilities[ind1]): continue
+                self.rows_changed[ind1] = 0
+            else:
+                if not self.cols_changed[ind1] or count != len(self.cols_possibilities[ind1]): continue
+                self.cols_changed[ind1] = 0
+            if self.check_done(row_ind, ind1): continue
+            self.states_explored += 1
+            if budget is not None: budget.tick()
 
             # step 3: Get only zeroes or only ones of lowest possibility 
-            for ind1, _, row_ind in self.lowest:
-                if not self.check_done(row_ind, ind1):
-                    if row_ind: values = self.rows_possibilities[ind1]
-                    else: values = self.cols_possibilities[ind1]
-                    same_ind = self.get_only_one_option(values)
-                    for ind2, val in same_ind:
-                        if row_ind: ri, ci = ind1, ind2
-                        else: ri, ci = ind2, ind1 
-                        if self.board[ri][ci] == 0:
-                            self.board[ri][ci] = val
-                            if row_ind: self.cols_possibilities[ci] = self.remove_possibilities(self.cols_possibilities[ci], ri, val)
-                            else: self.rows_possibilities[ri] = self.remove_possibilities(self.rows_possibilities[ri], ci, val)
-                            clear_output(wait=True)
-                            self.display_board()
-                            if self.savepath != '':
-                                self.save_board()
-                                self.n += 1
-                    self.update_done(row_ind, ind1)
-            self.check_solved()
+            if metrics is not None: start = time.perf_counter()
+            if row_ind: values = self.rows_possibilities[ind1]
+            else: values = self.cols_possibilities[ind1]
+            if not values: return False
+            same_ind = self.get_only_one_option(values)
+            if metrics is not None:
+                metrics.nodes_expanded += 1
+                metrics.consistency_checks += 1
+                metrics.successor_time += time.perf_counter() - start
+            for ind2, val in same_ind:
+                if row_ind: ri, ci = ind1, ind2
+                else: ri, ci = ind2, ind1 
+                if self.board[ri][ci] == 0:
+                    if not self.set_cell(ri, ci, val, row_ind): return False
+            self.update_done(row_ind, ind1)
+        if metrics is not None: start = time.perf_counter()
+        self.check_solved()
+        if metrics is not None: metrics.goal_test_time += time.perf_counter() - start
+        return True
+
+    def set_cell(self, ri, ci, val, row_ind=None):
+        # Fix one cell and filter the crossing line (both lines for a probe, row_ind=None).
+        # Returns False if a filtered line has no possibility left.
+        metrics = current_metrics()
+        if self.probing: self.trail.append(('cell', ri, ci))
+        self.board[ri][ci] = val
+        if metrics is not None:
+            before = len(self.cols_possibilities[ci]) + len(self.rows_possibilities[ri])
+        if row_ind is None or row_ind:
+            if self.probing: self.trail.append(('col', ci, self.cols_possibilities[ci]))
+            self.cols_possibilities[ci] = self.remove_possibilities(self.cols_possibilities[ci], ri, val)
+            self.enqueue(0, ci)
+        if row_ind is None or not row_ind:
+            if self.probing: self.trail.append(('row', ri, self.rows_possibilities[ri]))
+            self.rows_possibilities[ri] = self.remove_possibilities(self.rows_possibilities[ri], ci, val)
+            self.enqueue(1, ri)
+        if metrics is not None:
+            after = len(self.cols_possibilities[ci]) + len(self.rows_possibilities[ri])
+            metrics.prune("crossing line candidate removed", before - after)
+        if not self.probing:
+            self.show_step()
+        return bool(self.cols_possibilities[ci]) and bool(self.rows_possibilities[ri])
+
+    def undo(self, mark):
+        # Roll the trail back to `mark`. Possibility lists are restored by reference:
+        # remove_possibilities builds new lists, so the old ones were never modified.
+        while len(self.trail) > mark:
+            kind, idx, old = self.trail.pop()
+            if kind == 'cell': self.board[idx][old] = 0
+            elif kind == 'row': self.rows_possibilities[idx] = old
+            elif kind == 'col': self.cols_possibilities[idx] = old
+            elif kind == 'done':
+                if idx: self.rows_done[old] = 0
+                else: self.cols_done[old] = 0
+        # The state before the probe was a fixpoint: nothing is left to propagate.
+        self.queue = []
+        self.rows_changed = [0] * self.no_of_rows
+        self.cols_changed = [0] * self.no_of_cols
+        self.solved = False
+
+    def probe(self):
+        # For each unknown cell, tentatively set it and propagate. If that leads to a
+        # contradiction the cell must take the opposite value. Returns True once a
+        # cell was fixed (or the puzzle got solved), False if no probe was conclusive.
+        metrics = current_metrics()
+        for ri in range(self.no_of_rows):
+            for ci in range(self.no_of_cols):
+                if self.board[ri][ci] != 0: continue
+                for val in (1, -1):
+                    mark = len(self.trail)
+                    self.probing = True
+                    consistent = self.set_cell(ri, ci, val) and self.propagate()
+                    self.probing = False
+                    if consistent and self.solved:
+                        # The probe completed a valid board: keep it.
+                        del self.trail[mark:]
+                        self.show_step()
+                        return True
+                    self.undo(mark)
+                    if not consistent:
+                        if metrics is not None: metrics.prune("probe contradiction")
+                        if not (self.set_cell(ri, ci, -val) and self.propagate()):
+                            raise ValueError('The row and column clues are contradictory')
+                        return True
+        return False
                     
     def create_possibilities(self, values, no_of_other):
         possibilities = []
         
         for v in values:
+            if line_candidates is not None:
+                # Shared with the other engines; cells use 1 (filled) and -1 (empty).
+                possibilities.append([list(line) for line in line_candidates(v, no_of_other, empty=-1, filled=1)])
+                continue
             groups = len(v)
             no_empty = no_of_other-sum(v)-groups+1
             ones = [[1]*x for x in v]
@@ -78,36 +231,44 @@ class NonogramSolver:
             res_opts.append(res_opt)
         return res_opts
 
-    def select_index_not_done(self, possibilities, row_ind):
-        s = [len(i) for i in possibilities]
-        if row_ind:
-            return [(i, n, row_ind) for i, n in enumerate(s) if self.rows_done[i] == 0]
-        else:
-            return [(i, n, row_ind) for i, n in enumerate(s) if self.cols_done[i] == 0]
-
     def get_only_one_option(self, values):
-        return [(n, np.unique(i)[0]) for n, i in enumerate(np.array(values).T) if len(np.unique(i)) == 1]
+        values = np.array(values)
+        same = (values == values[0]).all(axis=0)
+        return [(n, values[0][n]) for n in np.flatnonzero(same)]
 
     def remove_possibilities(self, possibilities, i, val):
         return [p for p in possibilities if p[i] == val]
 
     def display_board(self):
+        import matplotlib.pyplot as plt
         plt.imshow(self.board, cmap='Greys')
         plt.axis('off')
         plt.show()
 
+    def show_step(self):
+        if self.show:
+            from IPython.display import clear_output
+            clear_output(wait=True)
+            self.display_board()
+        if self.sink is not None:
+            # Only copies the board; encoding and writing happen on the sink's thread.
+            self.sink.put(self.board)
+        elif self.savepath != '':
+            self.save_board()
+            self.n += 1
+
     def save_board(self, increase_size=20):
+        import matplotlib.pyplot as plt
         name = f'0000000{str(self.n)}'[-8:]
-        increased_board = np.zeros(np.array((self.no_of_rows, self.no_of_cols)) * increase_size)
-        for j in range(self.no_of_rows):
-            for k in range(self.no_of_cols):
-                increased_board[j * increase_size : (j+1) * increase_size, k * increase_size : (k+1) * increase_size] = self.board[j][k]
+        # Upscale every cell to an increase_size x increase_size block in one operation.
+        increased_board = np.kron(np.array(self.board, dtype=float), np.ones((increase_size, increase_size)))
         plt.imsave(os.path.join(self.savepath, f'{name}.jpeg'), increased_board, cmap='Greys', dpi=1000)
 
     def update_done(self, row_ind, idx):
         if row_ind: vals = self.board[idx]
         else: vals = [row[idx] for row in self.board]
-        if 0 not in vals:
+        if 0 not in vals and not self.check_done(row_ind, idx):
+            if self.probing: self.trail.append(('done', row_ind, idx))
             if row_ind: self.rows_done[idx] = 1
             else: self.cols_done[idx] = 1 
 
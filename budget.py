@@ -0,0 +1,78 @@
+from contextvars import ContextVar
+from time import perf_counter
+
+# -------------------------------
+# Cooperative deadlines, state limits and cancellation
+# -------------------------------
+# Works like metrics.current_metrics(): engines call current_budget() once per
+# call and, when it returns a SearchBudget, call tick() every time they count
+# an explored state. tick() raises SearchAborted once the deadline has passed,
+# the state limit is exceeded or cancel() was called (from any thread), which
+# unwinds iterative and recursive engines alike. Preprocessing loops that do
+# not explore states (candidate line generation, successor filtering) call
+# check() instead, so they cannot overrun the deadline either.
+#
+#     with bounded(SearchBudget(deadline=0.5, max_states=100_000)):
+#         sol3.solve_nonogram(column_clues, row_clues)
+#
+# The active budget lives in a ContextVar, so searches running at the same
+# time in different threads (or asyncio tasks) each see their own budget.
+
+_active = ContextVar("active_budget", default=None)
+
+
+class SearchAborted(Exception):
+    """Raised by SearchBudget.tick(); `reason` is 'timeout', 'state_limit' or 'cancelled'."""
+
+    def __init__(self, reason, states):
+        super().__init__(f"search aborted ({reason}) after {states} states")
+        self.reason = reason
+        self.states = states
+
+
+class SearchBudget:
+    def __init__(self, deadline=None, max_states=None):
+        # `deadline` is in seconds from now; it is stored as an absolute perf_counter() time.
+        self.deadline = None if deadline is None else perf_counter() + deadline
+        self.max_states = max_states
+        self.states = 0
+        self.cancelled = False
+
+    def cancel(self):
+        """Ask the engine to stop at its next tick."""
+        self.cancelled = True
+
+    def tick(self, count=1):
+        """Count explored states, then check()."""
+        self.states += count
+        self.check()
+
+    def check(self):
+        """Raise SearchAborted if the search must stop; for long loops that explore no states."""
+        if self.cancelled:
+            raise SearchAborted("cancelled", self.states)
+        if self.max_states is not None and self.states > self.max_states:
+            raise SearchAborted("state_limit", self.states)
+        if self.deadline is not None and perf_counter() > self.deadline:
+            raise SearchAborted("timeout", self.states)
+
+
+def current_budget():
+    """Return the active SearchBudget, or None when the search is unbounded."""
+    return _active.get()
+
+
+class bounded:
+    """Context manager that makes `budget` the active SearchBudget for its body."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self._token = None
+
+    def __enter__(self):
+        self._token = _active.set(self.budget)
+        return self.budget
+
+    def __exit__(self, exc_type, exc, tb):
+        _active.reset(self._token)
+        return False
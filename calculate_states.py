@@ -27,10 +27,10 @@ def calculate_row_states(clue: List[int], max_cells: int) -> int:
     # Compute the number of ways to distribute free spaces using combinations formula
     return comb(free_spaces + w, w)
 
-# Example Usage=
-print(calculate_row_states([3,1], 5))
-print(calculate_row_states([2,1], 5))
-print(calculate_row_states([1,1], 5))
-print(calculate_row_states([1,1], 5))
-print(calculate_row_states([1,2], 5))
-
+if __name__ == "__main__":
+    # Example Usage=
+    print(calculate_row_states([3,1], 5))
+    print(calculate_row_states([2,1], 5))
+    print(calculate_row_states([1,1], 5))
+    print(calculate_row_states([1,1], 5))
+    print(calculate_row_states([1,2], 5))
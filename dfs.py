@@ -7,11 +7,17 @@ def is_valid_line(line, clues):
 
 from itertools import product
 from itertools import groupby
+from time import perf_counter
+
+from budget import current_budget
+from metrics import current_metrics
 
 def solve_nonogram(column_clues, row_clues):
     rows, cols = len(row_clues), len(column_clues)
     grid = [[-1] * cols for _ in range(rows)]  # -1 represents an unknown cell
     states_explored = 0
+    metrics = current_metrics()
+    budget = current_budget()
     
     def is_valid():
         """Check if the current grid satisfies all filled rows and columns."""
@@ -27,13 +33,33 @@ def solve_nonogram(column_clues, row_clues):
     def dfs(r, c):
         nonlocal states_explored
         if r == rows:
-            return is_valid()
+            if metrics is None:
+                return is_valid()
+            start = perf_counter()
+            solved = is_valid()
+            metrics.goal_test_time += perf_counter() - start
+            return solved
         
         next_r, next_c = (r, c + 1) if c + 1 < cols else (r + 1, 0)
+        if metrics is not None:
+            metrics.nodes_expanded += 1
+            # The recursion depth is the frontier of this DFS.
+            metrics.frontier(r * cols + c + 1)
         for val in (0, 1):  # Try empty (0) or filled (1)
             grid[r][c] = val
             states_explored += 1
-            if is_valid() and dfs(next_r, next_c):
+            if budget is not None:
+                budget.tick()
+            if metrics is None:
+                valid = is_valid()
+            else:
+                start = perf_counter()
+                valid = is_valid()
+                metrics.consistency_checks += 1
+                metrics.successor_time += perf_counter() - start
+                if not valid:
+                    metrics.prune("completed line violates clue")
+            if valid and dfs(next_r, next_c):
                 return True
         grid[r][c] = -1  # Backtrack
         return False
@@ -41,15 +67,16 @@ def solve_nonogram(column_clues, row_clues):
     dfs(0, 0)
     return grid, states_explored
 
-# column_clues = [[1,1,1],[2,1],[3],[2],[2,1]]
-# row_clues = [[3,1],[2,1],[1,1],[1,2],[1,1]]
-column_clues = [[1],[1],[2],[3]]
-row_clues = [[1],[2],[3],[1]]
-column_clues = [[3],[2],[4],[4],[1,3]]
-row_clues = [[1,2],[1,2],[5],[4],[1,1]]
+if __name__ == "__main__":
+    # column_clues = [[1,1,1],[2,1],[3],[2],[2,1]]
+    # row_clues = [[3,1],[2,1],[1,1],[1,2],[1,1]]
+    column_clues = [[1],[1],[2],[3]]
+    row_clues = [[1],[2],[3],[1]]
+    column_clues = [[3],[2],[4],[4],[1,3]]
+    row_clues = [[1,2],[1,2],[5],[4],[1,1]]
 
-solution, states_explored = solve_nonogram(column_clues, row_clues)
-print("Solution:")
-for row in solution:
-    print("".join("#" if cell == 1 else "_" for cell in row))
-print("Game states explored:", states_explored)
+    solution, states_explored = solve_nonogram(column_clues, row_clues)
+    print("Solution:")
+    for row in solution:
+        print("".join("#" if cell == 1 else "_" for cell in row))
+    print("Game states explored:", states_explored)
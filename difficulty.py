@@ -0,0 +1,189 @@
+from budget import current_budget
+from line_cache import UNKNOWN, forced_cells
+
+# -------------------------------
+# Difficulty rating
+# -------------------------------
+# Rates a puzzle by the solving techniques it needs, in increasing order:
+#   1. line propagation: fix every cell that has the same value in all
+#      candidates of its row or column, until nothing changes;
+#   2. probing rounds: try each unknown cell both ways, and when one value
+#      leads to a contradiction under propagation, fix the other;
+#   3. branching: guess a cell and search, counting up to two solutions so
+#      uniqueness is known as well.
+# Forced cells come from the shared line cache, so rating a batch of
+# generated puzzles mostly costs cache lookups.
+
+
+class DifficultyRating:
+    def __init__(self):
+        self.solvable = False
+        self.unique = False
+        self.line_solvable = False   # Propagation alone solves it
+        self.line_rounds = 0         # Rounds of line propagation before it stalls
+        self.probe_rounds = 0        # Probing sweeps that fixed at least one cell
+        self.branches = 0            # Guesses made by the search after probing stalled
+        self.max_depth = 0           # Deepest nesting of guesses
+        self.open_cells = 0          # Cells still unknown after propagation and probing
+        self.solution = None         # 0/1 grid of the first solution found
+
+    @property
+    def level(self):
+        """0: line solvable, 1: needs probing, 2: needs branching, None: no unique solution."""
+        if not self.unique:
+            return None
+        if self.line_solvable:
+            return 0
+        return 1 if self.branches == 0 else 2
+
+    def to_dict(self):
+        return {
+            "solvable": self.solvable,
+            "unique": self.unique,
+            "line_solvable": self.line_solvable,
+            "line_rounds": self.line_rounds,
+            "probe_rounds": self.probe_rounds,
+            "branches": self.branches,
+            "max_depth": self.max_depth,
+            "open_cells": self.open_cells,
+            "level": self.level,
+        }
+
+    def __repr__(self):
+        return f"DifficultyRating({self.to_dict()})"
+
+
+def _set(grid, r, c, value, queue):
+    grid[r][c] = value
+    queue.add((True, r))
+    queue.add((False, c))
+
+
+def _solve_line(grid, row_clues, column_clues, is_row, idx, queue):
+    """Fix the forced cells of one line and queue the crossing lines. False on a contradiction."""
+    num_rows, num_cols = len(row_clues), len(column_clues)
+    if is_row:
+        known = grid[idx]
+        forced = forced_cells(row_clues[idx], num_cols, known)
+    else:
+        known = [grid[r][idx] for r in range(num_rows)]
+        forced = forced_cells(column_clues[idx], num_rows, known)
+    if forced is None:
+        return False
+    for i, (old, new) in enumerate(zip(known, forced)):
+        if old == UNKNOWN and new != UNKNOWN:
+            if is_row:
+                grid[idx][i] = new
+                queue.add((False, i))
+            else:
+                grid[i][idx] = new
+                queue.add((True, i))
+    return True
+
+
+def propagate(grid, row_clues, column_clues, queue):
+    """
+    Line propagation on `grid` (lists of 1, 0 or UNKNOWN), in place, starting
+    from the lines in `queue` (a set of (is_row, index)). Returns False on a contradiction.
+    """
+    while queue:
+        is_row, idx = queue.pop()
+        if not _solve_line(grid, row_clues, column_clues, is_row, idx, queue):
+            return False
+    return True
+
+
+def _propagate_rounds(grid, row_clues, column_clues, queue):
+    """
+    Like propagate(), but in rounds: every round solves the lines changed by
+    the previous one. Returns the number of rounds, or None on a contradiction.
+    """
+    rounds = 0
+    while queue:
+        rounds += 1
+        batch, queue = queue, set()
+        for is_row, idx in batch:
+            if not _solve_line(grid, row_clues, column_clues, is_row, idx, queue):
+                return None
+    return rounds
+
+
+def _unknown_cells(grid):
+    return [(r, c) for r, row in enumerate(grid) for c, cell in enumerate(row) if cell == UNKNOWN]
+
+
+def _probe_round(grid, row_clues, column_clues):
+    """
+    One sweep of probing over the unknown cells. Returns (progress, consistent):
+    whether a cell was fixed, and False if the grid turned out contradictory.
+    """
+    progress = False
+    for r, c in _unknown_cells(grid):
+        if grid[r][c] != UNKNOWN:
+            continue  # Fixed earlier in this sweep
+        for value in (1, 0):
+            trial = [row[:] for row in grid]
+            queue = set()
+            _set(trial, r, c, value, queue)
+            if propagate(trial, row_clues, column_clues, queue):
+                continue
+            # `value` is impossible, so the cell takes the other one.
+            queue = set()
+            _set(grid, r, c, 1 - value, queue)
+            if not propagate(grid, row_clues, column_clues, queue):
+                return progress, False
+            progress = True
+            break
+    return progress, True
+
+
+def rate_nonogram(row_clues, column_clues):
+    """Return the DifficultyRating of an R x C puzzle."""
+    rating = DifficultyRating()
+    num_rows, num_cols = len(row_clues), len(column_clues)
+    grid = [[UNKNOWN] * num_cols for _ in range(num_rows)]
+    queue = {(True, r) for r in range(num_rows)} | {(False, c) for c in range(num_cols)}
+    rounds = _propagate_rounds(grid, row_clues, column_clues, queue)
+    if rounds is None:
+        return rating
+    rating.line_rounds = rounds
+    rating.line_solvable = not _unknown_cells(grid)
+
+    while _unknown_cells(grid):
+        progress, consistent = _probe_round(grid, row_clues, column_clues)
+        if not consistent:
+            return rating
+        if not progress:
+            break
+        rating.probe_rounds += 1
+
+    rating.open_cells = len(_unknown_cells(grid))
+    budget = current_budget()
+    solutions = []
+
+    def search(grid, depth):
+        unknown = _unknown_cells(grid)
+        if not unknown:
+            solutions.append(grid)
+            return
+        r, c = unknown[0]
+        for value in (1, 0):
+            rating.branches += 1
+            if budget is not None:
+                budget.tick()
+            rating.max_depth = max(rating.max_depth, depth + 1)
+            trial = [row[:] for row in grid]
+            queue = set()
+            _set(trial, r, c, value, queue)
+            if propagate(trial, row_clues, column_clues, queue):
+                search(trial, depth + 1)
+            if len(solutions) >= 2:
+                return
+
+    # With nothing left unknown this just records the solution.
+    search(grid, 0)
+    rating.solvable = bool(solutions)
+    rating.unique = len(solutions) == 1
+    if solutions:
+        rating.solution = solutions[0]
+    return rating
@@ -1,88 +1,152 @@
 import csv
+import os
+from functools import lru_cache
+from glob import glob
+
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
-def convert_nonogram_to_png(input_csv_path: str,
-                            output_image_path: str,
-                            is_solution: bool,
-                            cell_size: int = 40):
-    """
-    Convert the CSV nonogram data into a PNG image.
-    If 'is_solution' is True, '#' cells are filled black.
-    Otherwise, all cells are left white.
-    Row and column clues are taken directly from the CSV.
-    """
-    # Read CSV data
-    with open(input_csv_path, mode="r") as file:
-        reader = csv.reader(file)
-        rows = list(reader)
+# Margins around the grid, in pixels.
+LEFT_MARGIN = 80
+TOP_MARGIN = 60
+BOTTOM_MARGIN = 20
+RIGHT_MARGIN = 20
 
-    # The first row has the format: ['Clue', 'col_clue1', 'col_clue2', ...]
-    column_clues = rows[0][1:]  # skip 'Clue'
-    
-    # The subsequent rows each have:
-    # row[0] -> row clue (e.g. '[2,1]')
-    # row[1:] -> the actual row cells (e.g. ['#','_','#','_','_'])
-    row_clues = []
-    grid = []
-    for r in rows[1:]:
-        row_clues.append(r[0])       # e.g. '[1,1]'
-        grid.append(r[1:])          # e.g. ['#','_','#','_','_']
+# Cell symbols that count as filled ('#' in our CSVs, '█' in nonogram_csv/).
+FILLED_CELLS = ('#', '█')
 
-    num_rows = len(grid)
-    num_cols = len(grid[0]) if num_rows > 0 else 0
 
-    # Margins
-    left_margin = 80
-    top_margin = 60
-    bottom_margin = 20
-    right_margin = 20
+@lru_cache(maxsize=None)
+def load_font(size=16):
+    """Load the clue font once per size; fall back to PIL's default font."""
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except IOError:
+        return ImageFont.load_default()
 
-    # Image dimensions
-    img_width = left_margin + (num_cols * cell_size) + right_margin
-    img_height = top_margin + (num_rows * cell_size) + bottom_margin
 
-    # Create a new image with a white background
-    img = Image.new("RGB", (img_width, img_height), "white")
-    draw = ImageDraw.Draw(img)
+@lru_cache(maxsize=4096)
+def _text_mask(text, size=16):
+    """
+    Render a clue string once into a grayscale mask. Clue strings such as '[1]'
+    repeat across rows, columns and puzzles, so most lookups are cache hits.
+    """
+    font = load_font(size)
+    left, top, right, bottom = font.getbbox(text)
+    mask = Image.new("L", (max(right, 1), max(bottom, 1)), 0)
+    ImageDraw.Draw(mask).text((0, 0), text, fill=255, font=font)
+    return mask
 
-    # Try loading a TrueType font; fallback to default if not found
-    try:
-        font = ImageFont.truetype("arial.ttf", 16)
-    except IOError:
-        font = ImageFont.load_default()
-
-    # Draw the grid
-    for row_idx in range(num_rows):
-        for col_idx in range(num_cols):
-            x1 = left_margin + col_idx * cell_size
-            y1 = top_margin + row_idx * cell_size
-            x2 = x1 + cell_size
-            y2 = y1 + cell_size
-
-            if is_solution and grid[row_idx][col_idx] == '#':
-                # Filled (solution)
-                draw.rectangle([x1, y1, x2, y2], fill="black")
-            else:
-                # Empty cell
-                draw.rectangle([x1, y1, x2, y2], outline="black", fill="white")
+
+@lru_cache(maxsize=256)
+def _clue_layer(row_clues, column_clues, num_rows, num_cols, cell_size):
+    """
+    White background with the row and column clues laid out. Cached, so the
+    problem and solution images of one puzzle share a single text layout.
+    """
+    img_width = LEFT_MARGIN + (num_cols * cell_size) + RIGHT_MARGIN
+    img_height = TOP_MARGIN + (num_rows * cell_size) + BOTTOM_MARGIN
+    img = Image.new("RGB", (img_width, img_height), "white")
 
     # Draw row clues on the left
-    for row_idx in range(num_rows):
-        clue_text = row_clues[row_idx]  # e.g. '[2,1]'
-        text_x = left_margin - 50
-        text_y = top_margin + row_idx * cell_size + (cell_size // 4)
-        draw.text((text_x, text_y), clue_text, fill="black", font=font)
+    for row_idx, clue_text in enumerate(row_clues):
+        text_x = LEFT_MARGIN - 50
+        text_y = TOP_MARGIN + row_idx * cell_size + (cell_size // 4)
+        img.paste("black", (text_x, text_y), _text_mask(clue_text))
 
     # Draw column clues above each column
-    for col_idx in range(num_cols):
-        clue_text = column_clues[col_idx]  # e.g. '[2,1]'
-        text_x = left_margin + col_idx * cell_size + (cell_size // 4)
-        text_y = top_margin - 30
-        draw.text((text_x, text_y), clue_text, fill="black", font=font)
-
-    # Save the image
-    img.save(output_image_path)
-    print(f"Image saved as {output_image_path}")
+    for col_idx, clue_text in enumerate(column_clues):
+        text_x = LEFT_MARGIN + col_idx * cell_size + (cell_size // 4)
+        text_y = TOP_MARGIN - 30
+        img.paste("black", (text_x, text_y), _text_mask(clue_text))
+    return img
+
+
+def cell_layer(filled, cell_size=40):
+    """
+    Build the grid as one uint8 array (0 = black, 255 = white) from a boolean
+    (rows, cols) array: every cell is upscaled in a single np.repeat, then the
+    grid lines are drawn with strided slices. Matches the old per-cell
+    rectangles, which shared their 1-pixel borders.
+    """
+    num_rows, num_cols = filled.shape
+    cells = np.where(filled, 0, 255).astype(np.uint8)
+    layer = np.full((num_rows * cell_size + 1, num_cols * cell_size + 1), 255, dtype=np.uint8)
+    layer[:-1, :-1] = np.repeat(np.repeat(cells, cell_size, axis=0), cell_size, axis=1)
+    layer[::cell_size, :] = 0
+    layer[:, ::cell_size] = 0
+    return layer
+
+
+def read_nonogram_csv(input_csv_path: str):
+    """
+    Read a nonogram CSV. The first row has the format ['Clue', 'col_clue1', ...];
+    the subsequent rows each have the row clue followed by the row cells.
+    Returns (column_clues, row_clues, grid), with clues kept as strings.
+    """
+    with open(input_csv_path, mode="r") as file:
+        rows = list(csv.reader(file))
+    column_clues = rows[0][1:]  # skip 'Clue'
+    row_clues = [r[0] for r in rows[1:]]
+    grid = [r[1:] for r in rows[1:]]
+    return column_clues, row_clues, grid
+
+
+def render_nonogram(column_clues, row_clues, grid, is_solution: bool, cell_size: int = 40):
+    """Return the nonogram as a PIL image."""
+    num_rows = len(grid)
+    num_cols = len(grid[0]) if num_rows > 0 else 0
+    img = _clue_layer(tuple(row_clues), tuple(column_clues), num_rows, num_cols, cell_size).copy()
+    if num_rows and num_cols:
+        filled = np.isin(np.array(grid), FILLED_CELLS) if is_solution else np.zeros((num_rows, num_cols), bool)
+        img.paste(Image.fromarray(cell_layer(filled, cell_size), mode="L"), (LEFT_MARGIN, TOP_MARGIN))
+    return img
+
+
+def convert_nonogram_to_png(input_csv_path: str,
+                            output_image_path: str,
+                            is_solution: bool,
+                            cell_size: int = 40,
+                            verbose: bool = True,
+                            compress_level: int = 6):
+    """
+    Convert the CSV nonogram data into a PNG image.
+    If 'is_solution' is True, filled cells are drawn black.
+    Otherwise, all cells are left white.
+    Row and column clues are taken directly from the CSV.
+    """
+    column_clues, row_clues, grid = read_nonogram_csv(input_csv_path)
+    image = render_nonogram(column_clues, row_clues, grid, is_solution, cell_size)
+    image.save(output_image_path, compress_level=compress_level)
+    if verbose:
+        print(f"Image saved as {output_image_path}")
+
+
+def convert_directory(input_dir: str,
+                      output_dir: str = None,
+                      is_solution: bool = True,
+                      cell_size: int = 40,
+                      suffix: str = "_output.png",
+                      compress_level: int = 1):
+    """
+    Render every CSV nonogram in input_dir in one call, writing
+    <name><suffix> into output_dir (input_dir by default).
+    Fonts, clue text and clue layouts are shared between all the images.
+    PNG compression dominates the cost of these small images, so batches use
+    a fast compression level by default.
+    Returns the list of written paths.
+    """
+    output_dir = output_dir or input_dir
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for input_csv_path in sorted(glob(os.path.join(input_dir, "*.csv"))):
+        name = os.path.splitext(os.path.basename(input_csv_path))[0]
+        output_image_path = os.path.join(output_dir, name + suffix)
+        convert_nonogram_to_png(input_csv_path, output_image_path, is_solution, cell_size,
+                                verbose=False, compress_level=compress_level)
+        written.append(output_image_path)
+    print(f"{len(written)} images saved to {output_dir}")
+    return written
 
 
 if __name__ == "__main__":
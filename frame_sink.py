@@ -0,0 +1,134 @@
+import queue
+import threading
+
+import numpy as np
+
+# -------------------------------
+# Background encoder for solver animations
+# -------------------------------
+# The solver hands board snapshots to put(), which only copies the board into
+# a small array and never waits: if the bounded queue is full the snapshot is
+# dropped, and the next one that gets queued carries its changes. The newest
+# dropped snapshot is kept as pending until then, and close() queues it with a
+# blocking put, so the final board always ends up in the file. A background
+# thread encodes the frames into a single file:
+#   .npz - first frame plus per-frame deltas (changed cell indices and values),
+#          written when the sink is closed
+#   .gif - one animated GIF, cells upscaled to `cell_size` pixels; each frame
+#          is appended to the file as it is encoded, so memory does not grow
+#          with the number of frames
+# Boards use the NonogramSolver convention: 1 filled, -1 empty, 0 unknown.
+
+
+class FrameSink:
+    def __init__(self, path, max_queue=256, cell_size=20, frame_duration=100):
+        if not str(path).endswith(('.npz', '.gif')):
+            raise ValueError(f"Animation path must end in .npz or .gif: {path}")
+        self.path = str(path)
+        self.cell_size = cell_size
+        self.frame_duration = frame_duration
+        self.frames = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = None            # Newest dropped snapshot, if no later one was queued
+        self._first = None
+        self._previous = None
+        self._indices = []
+        self._values = []
+        self._offsets = [0]
+        self._gif = None                # Open GIF file, once the first frame is written
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def put(self, board):
+        """Queue a snapshot of the board without blocking."""
+        frame = np.array(board, dtype=np.int8)
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+            self._pending = frame
+        else:
+            self._pending = None
+
+    def close(self):
+        """Queue the last dropped snapshot, wait for the frames to be encoded and write the file."""
+        if not self._thread.is_alive():
+            return
+        if self._pending is not None:
+            self._queue.put(self._pending)
+            self._pending = None
+            self.dropped -= 1
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            self._encode(frame)
+            self.frames += 1
+        self._write()
+
+    def _encode(self, frame):
+        if self.path.endswith('.gif'):
+            self._append_gif(frame)
+            return
+        flat = frame.ravel()
+        if self._first is None:
+            self._first = frame.copy()
+        else:
+            changed = np.flatnonzero(flat != self._previous)
+            self._indices.append(changed.astype(np.int32))
+            self._values.append(flat[changed])
+            self._offsets.append(self._offsets[-1] + len(changed))
+        self._previous = flat.copy()
+
+    def _append_gif(self, frame):
+        from PIL import Image, GifImagePlugin
+        # Palette indices: empty (-1) white, unknown (0) grey, filled (1) black,
+        # the same shading as display_board.
+        pixels = (frame + 1).astype(np.uint8)
+        pixels = np.kron(pixels, np.ones((self.cell_size, self.cell_size), dtype=np.uint8))
+        image = Image.fromarray(pixels, mode="L").convert("P")
+        image.putpalette([255, 255, 255, 192, 192, 192, 0, 0, 0])
+        if self._gif is None:
+            self._gif = open(self.path, 'wb')
+            header, _ = GifImagePlugin.getheader(image, info={"loop": 0})
+            self._gif.writelines(header)
+        self._gif.writelines(GifImagePlugin.getdata(image, duration=self.frame_duration))
+
+    def _write(self):
+        if self.path.endswith('.gif'):
+            if self._gif is not None:
+                self._gif.write(b";")
+                self._gif.close()
+            return
+        if self._first is None:
+            return
+        np.savez_compressed(
+            self.path,
+            first=self._first,
+            indices=np.concatenate(self._indices) if self._indices else np.zeros(0, np.int32),
+            values=np.concatenate(self._values) if self._values else np.zeros(0, np.int8),
+            offsets=np.array(self._offsets, dtype=np.int64),
+        )
+
+
+def load_frames(path):
+    """Yield the boards stored in a .npz animation written by FrameSink."""
+    data = np.load(path)
+    frame = data["first"].copy()
+    yield frame.copy()
+    flat = frame.ravel()
+    offsets = data["offsets"]
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        flat[data["indices"][start:end]] = data["values"][start:end]
+        yield frame.copy()
@@ -2,6 +2,7 @@ import random
 import csv
 from typing import List
 from calculate_states import calculate_row_states
+from difficulty import rate_nonogram
 
 def generate_clue(line: List[str]) -> List[int]:
     """
@@ -54,17 +55,17 @@ def generate_nonogram(size=4):
         if not valid:
             continue
         
-        # Prepare data for CSV
-        column_clues_str = [str(clue).replace(' ', '') for clue in column_clues]
-        
-        # First row of CSV: the column clues
-        data = [['Clue'] + column_clues_str]
-        
-        # Subsequent rows: row clue + the actual grid
-        for i in range(size):
-            data.append([str(row_clues[i]).replace(' ', '')] + grid[i])
-        
-        return data, row_clues, column_clues
+        return nonogram_data(grid, row_clues, column_clues), row_clues, column_clues
+
+
+def nonogram_data(grid, row_clues, column_clues):
+    """CSV-like data: a 'Clue' row with the column clues, then each row clue followed by its cells."""
+    # First row of CSV: the column clues
+    data = [['Clue'] + [str(clue).replace(' ', '') for clue in column_clues]]
+    # Subsequent rows: row clue + the actual grid
+    for i, row in enumerate(grid):
+        data.append([str(row_clues[i]).replace(' ', '')] + list(row))
+    return data
 
 def calculate_min_state(row_clues: List[List[int]], column_clues: List[List[int]], size: int) -> int:
     """
@@ -95,6 +96,118 @@ def generate_valid_nonogram(size=4):
     return nonogram_data
 
 
+def generate_rated_nonogram(size=4, accept=None, max_attempts=100000):
+    """
+    Keep generating random Nonograms until accept(rating) holds for the
+    DifficultyRating of their clues (by default: the solution is unique).
+    Rating takes about a millisecond, so thousands of candidates per second
+    can be filtered by real solving difficulty, e.g.
+        accept=lambda rating: rating.unique and rating.probe_rounds >= 1
+    Return (CSV-like data, rating).
+    """
+    if accept is None:
+        accept = lambda rating: rating.unique
+    for _ in range(max_attempts):
+        nonogram_data, row_clues, column_clues = generate_nonogram(size)
+        rating = rate_nonogram(row_clues, column_clues)
+        if accept(rating):
+            return nonogram_data, rating
+    raise ValueError(f"No accepted {size}x{size} nonogram in {max_attempts} attempts")
+
+
+def difficulty_score(rating) -> float:
+    """
+    Hill-climbing score of a DifficultyRating: puzzles without a unique solution
+    score minus the cells probing leaves open (fewer is closer to unique);
+    unique puzzles score by the techniques they need, then by how many rounds
+    of line propagation they take.
+    """
+    if not rating.unique:
+        return -rating.open_cells
+    return 100 * rating.level + 10 * (rating.probe_rounds + rating.branches) + rating.line_rounds
+
+
+def _mutate(grid, rng):
+    """
+    Flip one cell, or move a filled cell to an empty neighbour.
+    Returns the list of (row, col, old_value) changed, so the move can be undone.
+    """
+    rows, cols = len(grid), len(grid[0])
+    r, c = rng.randrange(rows), rng.randrange(cols)
+    if grid[r][c] == '#' and rng.random() < 0.5:
+        neighbours = [(r + dr, c + dc) for dr, dc in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                      if 0 <= r + dr < rows and 0 <= c + dc < cols and grid[r + dr][c + dc] == '_']
+        if neighbours:
+            nr, nc = rng.choice(neighbours)
+            grid[r][c], grid[nr][nc] = '_', '#'
+            return [(r, c, '#'), (nr, nc, '_')]
+    old = grid[r][c]
+    grid[r][c] = '_' if old == '#' else '#'
+    return [(r, c, old)]
+
+
+def mutate_nonogram(grid=None, size=4, accept=None, score=difficulty_score,
+                    max_steps=10000, single_block_columns=False, seed=None):
+    """
+    Hill-climb from `grid` (lists of '#'/'_'; a random size x size grid by default)
+    with local mutations until accept(rating) holds. Each step changes one or
+    two cells, recomputes the clues of the rows and columns it touched, and
+    re-rates the whole puzzle with rate_nonogram(). Propagation from an empty
+    grid repeats the line solves of earlier steps, which the shared line cache
+    answers; keeping the propagated grid between steps was tried and was slower,
+    since re-solving lines from partly dropped states misses the cache.
+    Moves that lower `score` are undone. With single_block_columns, moves that
+    give a column more than one block are rejected (the generate_nonogram rule).
+    By default a puzzle is accepted once its solution is unique and needs probing.
+    Return (CSV-like data, rating, steps).
+    """
+    rng = random.Random(seed)
+    if accept is None:
+        accept = lambda rating: rating.unique and rating.level >= 1
+    while grid is None:
+        grid = [[rng.choice(['#', '_']) for _ in range(size)] for _ in range(size)]
+        if single_block_columns and any(len(generate_clue(col)) > 1 for col in zip(*grid)):
+            grid = None
+    grid = [list(row) for row in grid]
+    rows, cols = len(grid), len(grid[0])
+    row_clues = [generate_clue(row) for row in grid]
+    column_clues = [generate_clue([grid[r][c] for r in range(rows)]) for c in range(cols)]
+    if single_block_columns and any(len(clue) > 1 for clue in column_clues):
+        raise ValueError("The starting grid has a column with more than one block")
+    rating = rate_nonogram(row_clues, column_clues)
+    current = score(rating)
+
+    for step in range(1, max_steps + 1):
+        if accept(rating):
+            return nonogram_data(grid, row_clues, column_clues), rating, step - 1
+        changes = _mutate(grid, rng)
+        touched_rows = {r for r, _, _ in changes}
+        touched_cols = {c for _, c, _ in changes}
+        old_rows = {r: row_clues[r] for r in touched_rows}
+        old_cols = {c: column_clues[c] for c in touched_cols}
+        for r in touched_rows:
+            row_clues[r] = generate_clue(grid[r])
+        for c in touched_cols:
+            column_clues[c] = generate_clue([grid[r][c] for r in range(rows)])
+        if single_block_columns and any(len(column_clues[c]) > 1 for c in touched_cols):
+            new_rating = None
+        else:
+            new_rating = rate_nonogram(row_clues, column_clues)
+        if new_rating is not None and score(new_rating) >= current:
+            # Equal scores are accepted too, so the climb can cross plateaus.
+            rating, current = new_rating, score(new_rating)
+            continue
+        for r, c, old in changes:
+            grid[r][c] = old
+        for r, clue in old_rows.items():
+            row_clues[r] = clue
+        for c, clue in old_cols.items():
+            column_clues[c] = clue
+    if accept(rating):
+        return nonogram_data(grid, row_clues, column_clues), rating, max_steps
+    raise ValueError(f"No accepted nonogram within {max_steps} mutation steps")
+
+
 def replace_shaded_squares(input_filename: str, output_filename: str):
     """
     Read a CSV, replace all '#' with '_', and save to a new file.
@@ -0,0 +1,224 @@
+import threading
+from collections import OrderedDict
+
+from budget import current_budget
+
+# -------------------------------
+# Shared LRU cache of line solutions
+# -------------------------------
+# Puzzle corpora repeat the same (clue, length) pairs constantly, and every
+# engine used to regenerate the candidate lines of each row and column from
+# scratch. All engines now go through line_candidates()/forced_cells(), which
+# share one process-wide cache keyed by (clue, length, known-cell mask).
+#
+# Lines are tuples of 0 (empty) and 1 (filled); a known-cell mask is a tuple
+# with -1 for unknown cells. Engines that use other cell symbols ('#'/'_',
+# 1/-1, ...) pass them as `empty`/`filled` so the converted lines are cached too.
+
+UNKNOWN = -1
+
+
+class LineCache:
+    """
+    Thread-safe LRU cache whose size is bounded by the total number of cached
+    candidate lines (not by the number of keys), so a few huge candidate sets
+    cannot exhaust memory.
+    """
+
+    def __init__(self, max_lines=1_000_000):
+        self.max_lines = max_lines
+        self.lines = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value = compute()
+        weight = len(value) if isinstance(value, tuple) and value and isinstance(value[0], tuple) else 1
+        if weight > self.max_lines:
+            return value
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, weight)
+                self.lines += weight
+                while self.lines > self.max_lines:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.lines -= evicted
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.lines = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "lines": self.lines,
+            "max_lines": self.max_lines,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+shared_cache = LineCache()
+
+
+def cache_info():
+    return shared_cache.info()
+
+
+def clear_cache():
+    shared_cache.clear()
+
+
+def set_cache_limit(max_lines):
+    """Change the bound of the shared cache; entries beyond it are evicted on the next insert."""
+    shared_cache.max_lines = max_lines
+
+
+def _normalise_clue(clue):
+    clue = tuple(clue)
+    return () if clue in ((), (0,)) else clue
+
+
+def _generate(clue, length):
+    """All lines of `length` cells matching `clue`, leftmost placements first."""
+    if not clue:
+        return ((0,) * length,)
+    results = []
+    last = len(clue) - 1
+    budget = current_budget()
+
+    def place(idx, pos, prefix):
+        block = clue[idx]
+        # Cells still needed by the blocks after this one, including their gaps.
+        rest = sum(clue[idx + 1:]) + (last - idx)
+        for start in range(pos, length - rest - block + 1):
+            line = prefix + [0] * (start - pos) + [1] * block
+            if idx == last:
+                results.append(tuple(line + [0] * (length - len(line))))
+                if budget is not None and len(results) % 1024 == 0:
+                    budget.check()
+            else:
+                place(idx + 1, start + block + 1, line + [0])
+
+    place(0, 0, [])
+    return tuple(results)
+
+
+def line_candidates(clue, length, known=None, empty=0, filled=1):
+    """
+    Return the tuple of all lines matching `clue` that agree with the `known`
+    cells (0/1, or -1 for unknown). Lines use `empty`/`filled` as cell values.
+    """
+    clue = _normalise_clue(clue)
+    if known is not None:
+        known = tuple(known)
+        if all(cell == UNKNOWN for cell in known):
+            known = None
+    key = ("lines", clue, length, known, empty, filled)
+
+    def compute():
+        if (empty, filled) != (0, 1):
+            return tuple(tuple(filled if cell else empty for cell in line)
+                         for line in line_candidates(clue, length, known))
+        if known is None:
+            return _generate(clue, length)
+        return tuple(line for line in line_candidates(clue, length)
+                     if all(k == UNKNOWN or k == cell for k, cell in zip(known, line)))
+
+    return shared_cache.get(key, compute)
+
+
+def _settle(clue, length, known):
+    """
+    Exact line solver in O(length * blocks) without enumerating candidates.
+    suffix[i][j]: cells i.. can hold blocks j.. ; a forward pass over the
+    reachable (cell, block) states then marks which value every cell takes in
+    at least one complete placement. Returns forced_cells() output.
+    """
+    if known is None:
+        known = (UNKNOWN,) * length
+    blocks = len(clue)
+    # empty_before[i]: number of cells known to be empty among the first i.
+    empty_before = [0]
+    for cell in known:
+        empty_before.append(empty_before[-1] + (cell == 0))
+
+    def fits(start, block):
+        # A block can cover start..start+block-1 and is not followed by a filled cell.
+        end = start + block
+        return (end <= length and empty_before[end] == empty_before[start]
+                and (end == length or known[end] != 1))
+
+    suffix = [[False] * (blocks + 1) for _ in range(length + 2)]
+    suffix[length][blocks] = suffix[length + 1][blocks] = True
+    for i in range(length - 1, -1, -1):
+        for j in range(blocks, -1, -1):
+            if known[i] != 1 and suffix[i + 1][j]:
+                suffix[i][j] = True
+            elif j < blocks and fits(i, clue[j]) and suffix[min(i + clue[j] + 1, length + 1)][j + 1]:
+                suffix[i][j] = True
+    if not suffix[0][0]:
+        return None
+
+    can_fill = [0] * (length + 1)    # Difference array: cells covered by some valid block
+    can_empty = [False] * length
+    reachable = [[False] * (blocks + 1) for _ in range(length + 2)]
+    reachable[0][0] = True
+    for i in range(length):
+        for j in range(blocks + 1):
+            if not reachable[i][j]:
+                continue
+            if known[i] != 1 and suffix[i + 1][j]:
+                can_empty[i] = True
+                reachable[i + 1][j] = True
+            if j < blocks and fits(i, clue[j]):
+                end = i + clue[j]
+                if suffix[min(end + 1, length + 1)][j + 1]:
+                    can_fill[i] += 1
+                    can_fill[end] -= 1
+                    if end < length:
+                        can_empty[end] = True
+                        reachable[end + 1][j + 1] = True
+    forced = []
+    covered = 0
+    for i in range(length):
+        covered += can_fill[i]
+        if covered and can_empty[i]:
+            forced.append(UNKNOWN)
+        elif covered:
+            forced.append(1)
+        elif can_empty[i]:
+            forced.append(0)
+        else:
+            return None
+    return tuple(forced)
+
+
+def forced_cells(clue, length, known=None):
+    """
+    Return a tuple with 1/0 for every cell that has the same value in all
+    candidate lines and -1 for cells that are still open, or None when no
+    candidate agrees with `known` (a contradiction). Computed by _settle(),
+    so long lines with many candidates cost no more than short ones.
+    """
+    clue = _normalise_clue(clue)
+    known = tuple(known) if known is not None else None
+    key = ("forced", clue, length, known)
+    return shared_cache.get(key, lambda: _settle(clue, length, known))
@@ -0,0 +1,180 @@
+import math
+import random
+from time import perf_counter
+
+from budget import SearchAborted, current_budget
+from metrics import current_metrics
+from newcode import arc_consistency, generate_all_row_combinations, line_mask, time_left
+
+# -------------------------------
+# Simulated annealing over row candidates
+# -------------------------------
+# Every row always holds one of its candidate lines, so the row clues are met
+# by construction and only the columns can be wrong. The objective is the
+# total column clue mismatch; a move swaps one row to another candidate.
+# Candidates are pruned by newcode.arc_consistency() first, which often leaves
+# most rows with a single candidate.
+#
+# Rows and columns are kept as int bitsets (bit c of a row is column c, bit r
+# of a column is row r). A move only touches the columns where the old and new
+# candidate differ, and each of those is re-scored from its bitset in
+# O(number of runs), so a move never rebuilds the grid the way
+# newcode.extract_column_clues() does. Memory is the candidate lists plus
+# O(R + C), whatever the size of the search space, which makes this the
+# engine for large, loosely constrained puzzles where the systematic searches
+# run out of memory. It cannot prove a puzzle unsolvable.
+
+
+def clue_error(bits, clue):
+    """
+    Mismatch between the runs of the column bitset `bits` (bit 0 is the top
+    cell) and `clue`: runs are compared in order, and unmatched runs or clue
+    numbers count in full. Zero exactly when the column matches the clue.
+    """
+    error = 0
+    i = 0
+    while bits:
+        bits >>= (bits & -bits).bit_length() - 1      # Skip the empty cells before the run
+        run = (~bits & (bits + 1)).bit_length() - 1   # Length of the run of ones
+        bits >>= run
+        error += abs(run - clue[i]) if i < len(clue) else run
+        i += 1
+    return error + sum(clue[i:])
+
+
+def simulated_annealing(row_clues, column_clues, max_moves=1_000_000, deadline=None,
+                        start_temperature=2.0, cooling=0.9995, min_temperature=0.05, seed=None):
+    """
+    Simulated annealing on an R x C puzzle. A random row is switched to a
+    random other candidate; the move is kept if it does not increase the
+    column error, or with probability exp(-delta / temperature) if it does.
+    The temperature is multiplied by `cooling` every move and reset to
+    start_temperature once it drops below min_temperature.
+    Stops at a solution, after max_moves moves, at `deadline` seconds, or when
+    the active SearchBudget runs out (one tick per move), and returns
+    (best_grid, best_error, moves): best_grid is the grid of '#'/'_' rows with
+    the lowest column error seen, and best_error == 0 means it is a solution.
+    Both deadlines include the setup (candidate generation and arc
+    consistency); arc consistency gets at most half of the time left after
+    generation, so the annealing always gets to run.
+    """
+    stop_at = None if deadline is None else perf_counter() + deadline
+    candidates, masks, clues = _prepare(row_clues, column_clues, stop_at)
+    left = None if stop_at is None else stop_at - perf_counter()
+    best_choice, best_error, moves = _anneal(masks, clues, max_moves, left, start_temperature, cooling,
+                                             min_temperature, random.Random(seed))
+    return [candidates[r][i] for r, i in enumerate(best_choice)], best_error, moves
+
+
+def _prepare(row_clues, column_clues, stop_at=None):
+    """
+    Return the row candidates, their bitsets, and the column clues with [] for
+    empty columns. Arc consistency stops halfway to `stop_at` (a perf_counter()
+    time) or the active budget's deadline, keeping the pruning done by then.
+    """
+    options = generate_all_row_combinations(row_clues, len(column_clues))
+    left = time_left(stop_at)
+    candidates, _, _ = arc_consistency(options, column_clues, len(row_clues),
+                                       None if left is None else max(left / 2, 0))
+    masks = [[line_mask(row) for row in candidates[r]] for r in range(len(row_clues))]
+    if any(not options for options in masks):
+        raise ValueError("The clues contradict each other")
+    clues = [[] if clue == [0] else list(clue) for clue in column_clues]
+    return candidates, masks, clues
+
+
+def _anneal(masks, clues, max_moves, deadline, start_temperature, cooling, min_temperature, rng):
+    """The annealing loop of simulated_annealing(); returns (best_choice, best_error, moves)."""
+    metrics = current_metrics()
+    budget = current_budget()
+    num_cols = len(clues)
+    movable = [r for r, options in enumerate(masks) if len(options) > 1]
+
+    choice = [rng.randrange(len(options)) for options in masks]
+    columns = [0] * num_cols
+    for r, options in enumerate(masks):
+        mask = options[choice[r]]
+        for c in range(num_cols):
+            if mask >> c & 1:
+                columns[c] |= 1 << r
+    errors = [clue_error(bits, clue) for bits, clue in zip(columns, clues)]
+    error = sum(errors)
+    best_error, best_choice = error, choice[:]
+    stop_at = None if deadline is None else perf_counter() + deadline
+    temperature = start_temperature
+    moves = 0
+
+    try:
+        while error and movable and moves < max_moves:
+            moves += 1
+            if budget is not None:
+                budget.tick()
+            if metrics is not None:
+                metrics.nodes_expanded += 1
+            if stop_at is not None and moves % 1024 == 0 and perf_counter() > stop_at:
+                break
+            r = movable[rng.randrange(len(movable))]
+            options = masks[r]
+            new = rng.randrange(len(options) - 1)
+            if new >= choice[r]:
+                new += 1                 # Any candidate but the current one
+            diff = options[choice[r]] ^ options[new]
+            bit = 1 << r
+            delta = 0
+            changed = []
+            while diff:
+                low = diff & -diff
+                diff ^= low
+                c = low.bit_length() - 1
+                bits = columns[c] ^ bit
+                new_error = clue_error(bits, clues[c])
+                delta += new_error - errors[c]
+                changed.append((c, bits, new_error))
+            if metrics is not None:
+                metrics.consistency_checks += len(changed)
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                choice[r] = new
+                for c, bits, new_error in changed:
+                    columns[c] = bits
+                    errors[c] = new_error
+                error += delta
+                if error < best_error:
+                    best_error, best_choice = error, choice[:]
+            temperature *= cooling
+            if temperature < min_temperature:
+                temperature = start_temperature
+    except SearchAborted:
+        pass
+    return best_choice, best_error, moves
+
+
+def benchmark(size=30, density=0.5, moves=200_000, seed=0):
+    """Print moves per second on a random size x size puzzle."""
+    rng = random.Random(seed)
+    grid = [['#' if rng.random() < density else '_' for _ in range(size)] for _ in range(size)]
+
+    def clue(line):
+        runs = [len(run) for run in ''.join(line).split('_') if run]
+        return runs or [0]
+
+    row_clues = [clue(row) for row in grid]
+    column_clues = [clue(col) for col in zip(*grid)]
+    start = perf_counter()
+    _, masks, clues = _prepare(row_clues, column_clues)
+    setup = perf_counter() - start
+    start = perf_counter()
+    _, error, done = _anneal(masks, clues, moves, None, 2.0, 0.9995, 0.05, random.Random(seed))
+    elapsed = perf_counter() - start
+    print(f"{size}x{size}: setup {setup:.2f} s, {done} moves in {elapsed:.2f} s "
+          f"({done / elapsed:,.0f} moves/s), best column error {error}")
+
+
+if __name__ == "__main__":
+    row_clues = [[1], [3], [5], [3], [1]]
+    column_clues = [[1], [3], [5], [3], [1]]
+    grid, error, moves = simulated_annealing(row_clues, column_clues, seed=0)
+    print(f"Column error {error} after {moves} moves")
+    for row in grid:
+        print("".join(row))
+    for size in (10, 20, 30):
+        benchmark(size)
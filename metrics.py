@@ -0,0 +1,99 @@
+import json
+import sys
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# -------------------------------
+# Shared solver metrics
+# -------------------------------
+# Solvers call current_metrics() once per call and only record anything when
+# it returns a SolverMetrics object, so profiling costs one None check when off.
+#
+#     with profile("A* Search") as stats:
+#         recorded_astar_search(puzzle)
+#     stats.to_json("astar_metrics.json")
+#
+# As in budget.py, the active metrics live in a ContextVar, so profile()
+# blocks running at the same time in different threads do not mix counters.
+
+_active = ContextVar("active_metrics", default=None)
+
+
+class SolverMetrics:
+    def __init__(self, engine=""):
+        self.engine = engine
+        self.nodes_expanded = 0         # Nodes whose successors were generated
+        self.consistency_checks = 0     # Partial/line validity checks performed
+        self.successor_time = 0.0       # Seconds spent generating successors
+        self.goal_test_time = 0.0       # Seconds spent in goal tests
+        self.peak_frontier = 0          # Largest frontier (queue/stack/heap) size seen
+        self.peak_rss_kb = 0            # Peak resident set size of the process, in KB
+        self.prune_reasons = Counter()  # Why candidates were rejected
+        self.wall_time = 0.0
+        self._start = None
+
+    def frontier(self, size):
+        if size > self.peak_frontier:
+            self.peak_frontier = size
+
+    def prune(self, reason, count=1):
+        self.prune_reasons[reason] += count
+
+    def to_dict(self):
+        return {
+            "engine": self.engine,
+            "nodes_expanded": self.nodes_expanded,
+            "consistency_checks": self.consistency_checks,
+            "successor_time": self.successor_time,
+            "goal_test_time": self.goal_test_time,
+            "peak_frontier": self.peak_frontier,
+            "peak_rss_kb": self.peak_rss_kb,
+            "prune_reasons": dict(self.prune_reasons),
+            "wall_time": self.wall_time,
+        }
+
+    def to_json(self, path=None):
+        """Return the metrics as a JSON string, and also write them to `path` if given."""
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, mode='w') as file:
+                file.write(text + "\n")
+        return text
+
+
+def current_metrics():
+    """Return the active SolverMetrics, or None when profiling is off."""
+    return _active.get()
+
+
+def peak_rss_kb():
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class profile:
+    """Context manager that makes a fresh SolverMetrics active for its body."""
+
+    def __init__(self, engine="", metrics=None):
+        self.metrics = metrics if metrics is not None else SolverMetrics(engine)
+        self._token = None
+
+    def __enter__(self):
+        self._token = _active.set(self.metrics)
+        self.metrics._start = time.perf_counter()
+        return self.metrics
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.wall_time += time.perf_counter() - self.metrics._start
+        self.metrics.peak_rss_kb = max(self.metrics.peak_rss_kb, peak_rss_kb())
+        _active.reset(self._token)
+        return False
@@ -1,47 +1,131 @@
+from array import array
 from itertools import product
 from collections import deque
 import heapq
+from time import perf_counter
+
+from budget import SearchAborted, current_budget
+from line_cache import line_candidates
+from metrics import current_metrics
+from spill_queue import SpillQueue
 
 # -------------------------------
 # Helper functions for Nonogram
 # -------------------------------
 
 def generate_row_combinations(row_clue, size):
-    """Generate all possible ways to fill a row of given size that satisfy row_clue."""
-    if row_clue == [0]:  # Special case: fully empty row
-        return [['_'] * size]
-    
-    total_blocks = sum(row_clue)
-    num_gaps = len(row_clue) - 1
-    total_empty = size - total_blocks - num_gaps  # remaining empty spaces
-    
-    results = []
-
-    def backtrack(idx, pos, row):
-        if idx == len(row_clue):
-            results.append(row[:])
-            return
-        block_size = row_clue[idx]
-        for i in range(pos, size - block_size + 1):
-            # Skip if any cell in the intended block is already filled
-            if any(cell == '#' for cell in row[i:i+block_size]):
-                continue
-            # For subsequent blocks, ensure a gap (an empty cell) exists before starting
-            if idx > 0 and row[i - 1] != '_':
-                continue
-            new_row = row[:]
-            new_row[i:i + block_size] = ['#'] * block_size
-            if i + block_size < size:
-                new_row[i + block_size] = '_'
-            backtrack(idx + 1, i + block_size + 1, new_row)
-    row = ['_'] * size
-    backtrack(0, 0, row)
-    return results
+    """
+    Generate all possible ways to fill a row of given size that satisfy row_clue.
+    Candidates come from the shared line cache (line_cache.py), so a clue that was
+    already solved for this size, in any puzzle, is not regenerated.
+    """
+    return [list(row) for row in line_candidates(row_clue, size, empty='_', filled='#')]
 
 def generate_all_row_combinations(row_clues, size):
     """Return a dictionary mapping each row index to its possible row combinations."""
     return {i: generate_row_combinations(clue, size) for i, clue in enumerate(row_clues)}
 
+_BITS = str.maketrans("#_", "10")
+
+def line_mask(line):
+    """Bitset of a '#'/'_' line: bit i is set when cell i is filled."""
+    return int("".join(reversed(line)).translate(_BITS), 2) if line else 0
+
+def column_bitsets(grid, num_cols):
+    """The columns of a (partial) grid as bitsets: bit r is set when row r fills the cell."""
+    if not grid:
+        return [0] * num_cols
+    return [int("".join(row[col] for row in reversed(grid)).translate(_BITS), 2) for col in range(num_cols)]
+
+def _cell_bitsets(lines, length):
+    """For each cell, the bitset of the lines (bit k is lines[k]) that fill it."""
+    if not lines:
+        return [0] * length
+    return [int("".join(line[i] for line in reversed(lines)).translate(_BITS), 2) for i in range(length)]
+
+def time_left(stop_at=None):
+    """
+    Seconds until `stop_at` (a perf_counter() time) or the active budget's
+    deadline, whichever comes first; None when there is neither.
+    """
+    budget = current_budget()
+    if budget is not None and budget.deadline is not None:
+        stop_at = budget.deadline if stop_at is None else min(stop_at, budget.deadline)
+    return None if stop_at is None else stop_at - perf_counter()
+
+def arc_consistency(row_options, column_clues, num_rows, deadline=None):
+    """
+    AC-3 between the row candidates and the column candidates: a row candidate
+    is removed when no remaining candidate of some column agrees with it on
+    their shared cell, and the reverse, until nothing changes. Candidate sets
+    are int bitsets over candidate indices, so revising a line against all its
+    crossing lines is two big-int ANDs per cell.
+    Returns (pruned_row_options, candidates_before, candidates_after); the
+    pruned options keep their original order, and when the puzzle turns out to
+    have no solution every row is left without options. With a `deadline` in
+    seconds it stops once that time is up and returns the pruning done so far:
+    every removal is sound on its own, so the result is weaker, never wrong.
+    """
+    num_cols = len(column_clues)
+    budget = current_budget()
+    before = sum(len(row_options[r]) for r in range(num_rows))
+    stop_at = None if deadline is None else perf_counter() + deadline
+    # The deadline covers building the column candidates and bitsets too; running out
+    # before any revision returns the row options unpruned.
+    unpruned = {r: row_options[r] for r in range(num_rows)}, before, before
+    column_options = []
+    for clue in column_clues:
+        if stop_at is not None and perf_counter() > stop_at:
+            return unpruned
+        column_options.append(generate_row_combinations(clue, num_rows))
+    # fills[line][cell]: candidates of that line filling that cell; alive[line]: remaining candidates.
+    # Lines 0..R-1 are the rows, R..R+C-1 the columns.
+    options = [row_options[r] for r in range(num_rows)] + column_options
+    if not all(options):
+        # A clue that does not fit its line: no solution before any revision.
+        return {r: [] for r in range(num_rows)}, before, 0
+    lengths = [num_cols] * num_rows + [num_rows] * num_cols
+    fills = []
+    for lines, length in zip(options, lengths):
+        if stop_at is not None and perf_counter() > stop_at:
+            return unpruned
+        fills.append(_cell_bitsets(lines, length))
+    alive = [(1 << len(lines)) - 1 for lines in options]
+    queue = deque(range(len(options)))
+    queued = [True] * len(options)
+    while queue:
+        if stop_at is not None and perf_counter() > stop_at:
+            break
+        line = queue.popleft()
+        queued[line] = False
+        if line < num_rows:
+            crossing, position = num_rows, line
+        else:
+            crossing, position = 0, line - num_rows
+        for cell, fill in enumerate(fills[line]):
+            if budget is not None:
+                budget.check()
+            other = crossing + cell
+            other_fill = fills[other][position]
+            remaining = alive[other]
+            if not alive[line] & fill:
+                remaining &= ~other_fill      # This line cannot fill the shared cell
+            if not alive[line] & ~fill:
+                remaining &= other_fill       # This line cannot leave it empty
+            if remaining != alive[other]:
+                if not remaining:
+                    # A line without candidates: no solution, so no row candidate survives.
+                    return {r: [] for r in range(num_rows)}, before, 0
+                alive[other] = remaining
+                if not queued[other]:
+                    queue.append(other)
+                    queued[other] = True
+    pruned = {}
+    for r in range(num_rows):
+        kept = bin(alive[r])[:1:-1]   # Bit k as character k
+        pruned[r] = [option for option, bit in zip(row_options[r], kept) if bit == '1']
+    return pruned, before, sum(len(lines) for lines in pruned.values())
+
 def extract_column_clues(grid):
     """Extract column clues from a full grid."""
     num_cols = len(grid[0])
@@ -65,12 +149,16 @@ def grid_matches_column_clues(grid, column_clues):
     """Check if the full grid matches the given column clues."""
     return extract_column_clues(grid) == column_clues
 
-def is_partial_column_consistent(partial_col, clue):
+def is_partial_column_consistent(partial_col, clue, total_length=None):
     """
     Check if the partial column can still be extended to satisfy the full clue.
-    Build the blocks from the partial column and ensure that they are a prefix of the clue
-    and that no block is already longer than allowed.
+    Build the blocks from the partial column and ensure that they are a prefix of the clue:
+    no block is longer than allowed and every closed block has exactly its clue length.
+    If total_length is given, also check that the rest of the clue still fits in the
+    cells that are left.
     """
+    if clue == [0]:
+        clue = []
     blocks = []
     count = 0
     for cell in partial_col:
@@ -79,13 +167,74 @@ def is_partial_column_consistent(partial_col, clue):
         elif count > 0:
             blocks.append(count)
             count = 0
-    if count > 0:
+    open_block = count > 0
+    if open_block:
         blocks.append(count)
+    last = len(blocks) - 1
     for i, block in enumerate(blocks):
         if i >= len(clue) or block > clue[i]:
             return False
+        if block < clue[i] and not (open_block and i == last):
+            return False
+    if total_length is not None:
+        rest = clue[len(blocks):]
+        # Every remaining block needs its cells plus one separating empty cell.
+        needed = sum(rest) + len(rest)
+        if open_block:
+            needed += clue[last] - blocks[last]
+        elif rest:
+            needed -= 1
+        if needed > total_length - len(partial_col):
+            return False
     return True
 
+def is_partial_column_bitset_consistent(bits, length, clue, total_length):
+    """
+    is_partial_column_consistent() for a column given as a bitset of its first
+    `length` cells (bit 0 is the top cell). Runs are found with bit tricks
+    (lowest set bit, then the lowest clear bit above it), so the cost is one
+    step per run instead of one per cell.
+    """
+    if clue == [0]:
+        clue = []
+    open_block = length > 0 and bits >> (length - 1) & 1
+    i = 0
+    run = 0
+    while bits:
+        bits >>= (bits & -bits).bit_length() - 1      # Drop the empty cells before the run
+        run = (~bits & (bits + 1)).bit_length() - 1   # Length of the run of ones
+        bits >>= run
+        if i >= len(clue) or run > clue[i]:
+            return False
+        if run < clue[i] and not (open_block and not bits):
+            return False
+        i += 1
+    rest = clue[i:]
+    needed = sum(rest) + len(rest)
+    if open_block:
+        needed += clue[i - 1] - run
+    elif rest:
+        needed -= 1
+    return needed <= total_length - length
+
+def allowed_cells(columns, length, clues, total_length):
+    """
+    For the next row of a partial grid whose columns are the bitsets `columns`
+    over `length` rows, return (may_fill, may_leave_empty): bitsets over the
+    columns that stay consistent when that row fills, or leaves empty, its cell.
+    A row option with bitset m is then consistent exactly when
+    m & ~may_fill == 0 and ~m & must_fill == 0, with must_fill the columns
+    missing from may_leave_empty, which checks all columns in two word-level ops.
+    """
+    bit = 1 << length
+    may_fill = may_leave_empty = 0
+    for col, (bits, clue) in enumerate(zip(columns, clues)):
+        if is_partial_column_bitset_consistent(bits | bit, length + 1, clue, total_length):
+            may_fill |= 1 << col
+        if is_partial_column_bitset_consistent(bits, length + 1, clue, total_length):
+            may_leave_empty |= 1 << col
+    return may_fill, may_leave_empty
+
 # -------------------------------
 # Search Tree Node Class
 # -------------------------------
@@ -102,12 +251,72 @@ class SearchTreeNode:
 # -------------------------------
 
 class NonogramPuzzle:
-    def __init__(self, row_clues, column_clues, size):
+    """
+    Row-by-row search formulation for an R x C puzzle (R = len(row_clues),
+    C = len(column_clues)). `size` is only kept for the old square call style.
+
+    Complexity limits: the row options of one row hold C(free + k, k) lines,
+    where k is the number of blocks in the clue and free = C - sum(clue) - (k - 1).
+    This stays small for typical 30x30 to 50x50 clues (a [1, 1, 1] clue in 50
+    columns has 17296 options) but explodes for long runs of single cells.
+    The search itself is exponential in R in the worst case. For large grids,
+    iterative_deepening_astar_search keeps O(R) memory; the recorded searches
+    keep every visited node unless an exporter is given.
+
+    With arc_consistent (the default) the row options are first pruned by
+    arc_consistency(); pruning_ratio is the fraction that was removed. With
+    arc_share, arc consistency may only use that fraction of the time left
+    before the active budget's deadline, and keeps the pruning done by then.
+    row_masks holds the bitset of every row option (see line_mask()), which
+    successors() checks against the columns with allowed_cells().
+    """
+
+    def __init__(self, row_clues, column_clues, size=None, arc_consistent=True, arc_share=None):
         self.row_clues = row_clues
         self.column_clues = column_clues
-        self.size = size
-        # Pre-calculate the possible combinations for each row.
-        self.row_options = generate_all_row_combinations(row_clues, size)
+        self.num_rows = len(row_clues)
+        self.num_cols = len(column_clues)
+        if size is not None and (size != self.num_rows or size != self.num_cols):
+            raise ValueError(f"size={size} does not match {self.num_rows} row clues "
+                             f"and {self.num_cols} column clues")
+        # The search depth: one row is assigned per step.
+        self.size = self.num_rows
+        # Pre-calculate the possible combinations for each row, and drop the ones
+        # no column candidate supports, so every search starts from the pruned sets.
+        self.row_options = generate_all_row_combinations(row_clues, self.num_cols)
+        self.candidates_before = self.candidates_after = sum(len(options) for options in self.row_options.values())
+        if arc_consistent:
+            left = time_left() if arc_share is not None else None
+            self.row_options, self.candidates_before, self.candidates_after = arc_consistency(
+                self.row_options, column_clues, self.num_rows, None if left is None else max(left * arc_share, 0))
+            metrics = current_metrics()
+            if metrics is not None:
+                metrics.prune("arc consistency", self.candidates_before - self.candidates_after)
+        self.row_masks = {r: [line_mask(option) for option in options] for r, options in self.row_options.items()}
+        # For heuristic(): per column, how many of the rows from r on may fill
+        # the cell (some option does) and must fill it (every option does).
+        self.column_sums = [sum(clue) for clue in column_clues]
+        self.may_fill_below = [[0] * self.num_cols for _ in range(self.num_rows + 1)]
+        self.must_fill_below = [[0] * self.num_cols for _ in range(self.num_rows + 1)]
+        for r in reversed(range(self.num_rows)):
+            masks = self.row_masks.get(r, [])
+            may = must = 0
+            if masks:
+                for mask in masks:
+                    may |= mask
+                must = masks[0]
+                for mask in masks[1:]:
+                    must &= mask
+            for c in range(self.num_cols):
+                self.may_fill_below[r][c] = self.may_fill_below[r + 1][c] + (may >> c & 1)
+                self.must_fill_below[r][c] = self.must_fill_below[r + 1][c] + (must >> c & 1)
+    
+    @property
+    def pruning_ratio(self):
+        """Fraction of the row candidates removed by arc consistency."""
+        if not self.candidates_before:
+            return 0.0
+        return 1 - self.candidates_after / self.candidates_before
     
     @property
     def initial_state(self):
@@ -119,131 +328,297 @@ class NonogramPuzzle:
         row_idx, grid = state
         # A complete assignment is reached when row index equals size.
         # Then we check if the grid (all rows assigned) satisfies column clues.
-        return row_idx == self.size and grid_matches_column_clues(grid, self.column_clues)
+        metrics = current_metrics()
+        if metrics is None:
+            return row_idx == self.size and grid_matches_column_clues(grid, self.column_clues)
+        start = perf_counter()
+        result = row_idx == self.size and grid_matches_column_clues(grid, self.column_clues)
+        metrics.goal_test_time += perf_counter() - start
+        return result
     
     def is_partial_consistent(self, grid):
         """
         For each column, check if the partial assignment (grid so far) can
         still be extended to satisfy the corresponding column clue.
         """
-        for col in range(self.size):
-            # Build the partial column from the assigned rows only.
-            partial_col = [grid[row][col] for row in range(len(grid))]
-            if not is_partial_column_consistent(partial_col, self.column_clues[col]):
-                return False
-        return True
+        columns = column_bitsets(grid, self.num_cols)
+        return all(is_partial_column_bitset_consistent(bits, len(grid), clue, self.num_rows)
+                   for bits, clue in zip(columns, self.column_clues))
+    
+    def next_row_constraints(self, state):
+        """
+        Return (may_fill, must_fill) for the next row of `state`: an option with
+        bitset m keeps the grid consistent exactly when
+        not (m & ~may_fill or must_fill & ~m).
+        """
+        row_idx, grid = state
+        columns = column_bitsets(grid, self.num_cols)
+        may_fill, may_leave_empty = allowed_cells(columns, row_idx, self.column_clues, self.num_rows)
+        return may_fill, ((1 << self.num_cols) - 1) & ~may_leave_empty
     
     def successors(self, state):
         """
-        Return a list of successor states.
+        Lazily yield successor states.
         Each successor is generated by assigning one of the possible rows for the next row index.
-        Only add successors if the resulting partial grid is consistent.
+        Only yield successors if the resulting partial grid is consistent.
+        The parent's columns are turned into bitsets once per expansion, which gives
+        the cells the next row may fill or leave empty; each option is then checked
+        against every column at once with two mask tests (see allowed_cells()).
+        Row options are checked one at a time, so a caller that stops early never
+        pays for the siblings it does not visit.
         """
         row_idx, grid = state
         if row_idx >= self.size:
-            return []
-        next_states = []
-        for option in self.row_options[row_idx]:
-            new_grid = grid + [option]
-            if self.is_partial_consistent(new_grid):
-                next_states.append((row_idx + 1, new_grid))
-        return next_states
+            return
+        metrics = current_metrics()
+        budget = current_budget()
+        start = perf_counter() if metrics is not None else None
+        may_fill, must_fill = self.next_row_constraints(state)
+        options = zip(self.row_options[row_idx], self.row_masks[row_idx])
+        if metrics is None:
+            for option, mask in options:
+                if budget is not None:
+                    budget.check()
+                if not (mask & ~may_fill or must_fill & ~mask):
+                    yield (row_idx + 1, grid + [option])
+            return
+        metrics.nodes_expanded += 1
+        metrics.successor_time += perf_counter() - start
+        for option, mask in options:
+            # Only the work done inside this generator is timed, not the time the
+            # caller spends between two successors.
+            if budget is not None:
+                budget.check()
+            start = perf_counter()
+            consistent = not (mask & ~may_fill or must_fill & ~mask)
+            metrics.consistency_checks += 1
+            metrics.successor_time += perf_counter() - start
+            if consistent:
+                yield (row_idx + 1, grid + [option])
+            else:
+                metrics.prune("column prefix mismatch")
     
     def cost(self, state, action, next_state):
         # Each row assignment costs 1.
         return 1
     
     def heuristic(self, state):
-        # A simple (admissible) heuristic: number of rows remaining.
-        row_idx, _ = state
+        """
+        Rows remaining, or infinity when some column can no longer be completed:
+        the filled cells it still needs must come from the remaining rows, so
+        their number lies between how many of those rows must fill it (every
+        option does) and how many may (some option does). Every solution is
+        exactly size rows deep, so rows remaining is exact for any branch that
+        can still be completed; f only varies by ruling out dead ends.
+        """
+        row_idx, grid = state
+        columns = column_bitsets(grid, self.num_cols)
+        for bits, total, most, least in zip(columns, self.column_sums,
+                                            self.may_fill_below[row_idx], self.must_fill_below[row_idx]):
+            need = total - bin(bits).count("1")
+            if need > most or need < least:
+                return float('inf')
         return self.size - row_idx
 
 # -------------------------------
 # Recorded Search Algorithms (with Search Tree)
 # -------------------------------
 
-def recorded_breadth_first_search(problem):
+def record_child(node, child, exporter=None):
+    """
+    Record a newly generated node.
+    Without an exporter the child is attached to its parent's children, building
+    the in-memory search tree. With an exporter (see tree_export.py) it is written
+    out immediately instead, so the tree is never held in memory.
+    """
+    if exporter is not None:
+        exporter.add_node(child)
+    elif node is not None:
+        node.children.append(child)
+
+def recorded_breadth_first_search(problem, exporter=None):
     """BFS that records the search tree."""
     root = SearchTreeNode(problem.initial_state, cost=0)
+    record_child(None, root, exporter)
+    metrics = current_metrics()
+    budget = current_budget()
     frontier = deque([root])
     states_explored = 0
     while frontier:
+        if metrics is not None:
+            metrics.frontier(len(frontier))
         node = frontier.popleft()
         states_explored += 1
+        if budget is not None:
+            budget.tick()
         if problem.goal_test(node.state):
             return node, states_explored, root
         for succ in problem.successors(node.state):
             child = SearchTreeNode(succ, cost=node.cost + 1, parent=node)
-            node.children.append(child)
+            record_child(node, child, exporter)
             frontier.append(child)
     return None, states_explored, root
 
-def recorded_depth_first_search(problem):
-    """DFS that records the search tree."""
-    root = SearchTreeNode(problem.initial_state, cost=0)
-    frontier = [root]
+def capped_breadth_first_search(problem, memory_cap=64 * 2**20, spill_dir=None):
+    """
+    BFS whose frontier holds at most about memory_cap bytes in memory.
+    Frontier states are kept as vectors of row-option indices instead of
+    full-grid nodes, and the part beyond the cap is spilled to temporary files
+    (see spill_queue.SpillQueue) and read back in FIFO order, so states are
+    explored in exactly the order of recorded_breadth_first_search and
+    states_explored is the same. No search tree is recorded.
+    Returns (solution_node, states_explored, stats) where stats has the states
+    explored per depth ("levels") and the spill counters.
+    """
+    metrics = current_metrics()
+    budget = current_budget()
     states_explored = 0
-    while frontier:
-        node = frontier.pop()
+    levels = [0] * (problem.size + 1)
+    solution = None
+    with SpillQueue(memory_cap, spill_dir) as frontier:
+        frontier.append(())
+        while frontier:
+            if metrics is not None:
+                metrics.frontier(len(frontier))
+            indices = frontier.popleft()
+            row_idx = len(indices)
+            state = (row_idx, [problem.row_options[row][i] for row, i in enumerate(indices)])
+            states_explored += 1
+            levels[row_idx] += 1
+            if budget is not None:
+                budget.tick()
+            if problem.goal_test(state):
+                solution = SearchTreeNode(state, cost=row_idx)
+                break
+            if row_idx >= problem.size:
+                continue
+            may_fill, must_fill = problem.next_row_constraints(state)
+            if metrics is not None:
+                metrics.nodes_expanded += 1
+                metrics.consistency_checks += len(problem.row_masks[row_idx])
+            for i, mask in enumerate(problem.row_masks[row_idx]):
+                if not (mask & ~may_fill or must_fill & ~mask):
+                    frontier.append(indices + array('I', [i]))
+                elif metrics is not None:
+                    metrics.prune("column prefix mismatch")
+        stats = {
+            "levels": levels,
+            "segments_spilled": frontier.segments_written,
+            "bytes_spilled": frontier.bytes_spilled,
+            "peak_memory_bytes": frontier.peak_memory_bytes,
+        }
+    return solution, states_explored, stats
+
+def recorded_depth_first_search(problem, exporter=None):
+    """
+    DFS that records the search tree.
+    Uses an explicit stack of successor iterators, so each child is generated
+    (and recorded) only when the search actually descends into it.
+    """
+    root = SearchTreeNode(problem.initial_state, cost=0)
+    record_child(None, root, exporter)
+    metrics = current_metrics()
+    budget = current_budget()
+    states_explored = 1
+    if budget is not None:
+        budget.tick()
+    if problem.goal_test(root.state):
+        return root, states_explored, root
+    stack = [(root, problem.successors(root.state))]
+    while stack:
+        if metrics is not None:
+            metrics.frontier(len(stack))
+        node, children = stack[-1]
+        succ = next(children, None)
+        if succ is None:
+            stack.pop()
+            continue
+        child = SearchTreeNode(succ, cost=node.cost + 1, parent=node)
+        record_child(node, child, exporter)
         states_explored += 1
-        if problem.goal_test(node.state):
-            return node, states_explored, root
-        for succ in problem.successors(node.state):
-            child = SearchTreeNode(succ, cost=node.cost + 1, parent=node)
-            node.children.append(child)
-            frontier.append(child)
+        if budget is not None:
+            budget.tick()
+        if problem.goal_test(child.state):
+            return child, states_explored, root
+        stack.append((child, problem.successors(child.state)))
     return None, states_explored, root
 
-def recorded_uniform_cost_search(problem):
+def recorded_uniform_cost_search(problem, exporter=None):
     """Uniform-Cost Search that records the search tree."""
     root = SearchTreeNode(problem.initial_state, cost=0)
+    record_child(None, root, exporter)
+    metrics = current_metrics()
+    budget = current_budget()
     frontier = []
     counter = 0  # Tie-breaker counter
     heapq.heappush(frontier, (0, counter, root))
     states_explored = 0
     while frontier:
+        if metrics is not None:
+            metrics.frontier(len(frontier))
         cost, _, node = heapq.heappop(frontier)
         states_explored += 1
+        if budget is not None:
+            budget.tick()
         if problem.goal_test(node.state):
             return node, states_explored, root
         for succ in problem.successors(node.state):
             child = SearchTreeNode(succ, cost=node.cost + 1, parent=node)
-            node.children.append(child)
+            record_child(node, child, exporter)
             counter += 1
             heapq.heappush(frontier, (child.cost, counter, child))
     return None, states_explored, root
 
-def recorded_depth_limited_search(problem, limit):
-    """Depth-Limited DFS that records the search tree."""
-    states_explored = 0
+def recorded_depth_limited_search(problem, limit, exporter=None):
+    """
+    Depth-Limited DFS that records the search tree.
+    Iterative version of the recursive DLS: the stack holds one lazy successor
+    iterator per level, so memory stays O(limit) plus the recorded tree.
+    """
     root = SearchTreeNode(problem.initial_state, cost=0)
-    
-    def recursive_dls(node, depth):
-        nonlocal states_explored
+    record_child(None, root, exporter)
+    metrics = current_metrics()
+    budget = current_budget()
+    states_explored = 1
+    if budget is not None:
+        budget.tick()
+    if problem.goal_test(root.state):
+        return root, states_explored, root
+    if limit == 0:
+        return None, states_explored, root
+    stack = [(root, problem.successors(root.state))]
+    while stack:
+        if metrics is not None:
+            metrics.frontier(len(stack))
+        node, children = stack[-1]
+        succ = next(children, None)
+        if succ is None:
+            stack.pop()
+            continue
+        child = SearchTreeNode(succ, cost=node.cost + 1, parent=node)
+        record_child(node, child, exporter)
         states_explored += 1
-        if problem.goal_test(node.state):
-            return node
-        if depth == 0:
-            return None
-        for succ in problem.successors(node.state):
-            child = SearchTreeNode(succ, cost=node.cost + 1, parent=node)
-            node.children.append(child)
-            result = recursive_dls(child, depth - 1)
-            if result is not None:
-                return result
-        return None
-
-    result = recursive_dls(root, limit)
-    return result, states_explored, root
+        if budget is not None:
+            budget.tick()
+        if problem.goal_test(child.state):
+            return child, states_explored, root
+        if len(stack) < limit:
+            stack.append((child, problem.successors(child.state)))
+        elif metrics is not None:
+            metrics.prune("depth limit")
+    return None, states_explored, root
 
-def recorded_iterative_deepening_search(problem):
+def recorded_iterative_deepening_search(problem, exporter=None):
     """Iterative Deepening DFS that records the search tree.
-       (Returns the tree from the successful depth-limited search.)"""
+       (Returns the tree from the successful depth-limited search.)
+       The first limit is the heuristic of the initial state: no solution can be
+       shallower than that, so the useless shallow iterations are skipped. It is
+       capped at size, as the heuristic is infinite when a column cannot be completed."""
     total_explored = 0
-    limit = 0
+    limit = min(problem.heuristic(problem.initial_state), problem.size)
     final_tree = None
     while True:
-        result, explored, tree = recorded_depth_limited_search(problem, limit)
+        result, explored, tree = recorded_depth_limited_search(problem, limit, exporter)
         total_explored += explored
         if result is not None:
             final_tree = tree
@@ -252,61 +627,336 @@ def recorded_iterative_deepening_search(problem):
         if limit > problem.size:  # safeguard in case no solution is found
             return None, total_explored, tree
 
-def recorded_greedy_search(problem):
+def iterative_deepening_astar_search(problem, verbose=False):
+    """
+    IDA* Search bounded by f = g + h.
+    No search tree is recorded: only the current path and one successor iterator
+    per level are kept, so memory is O(depth) and it can run on puzzles whose
+    frontier would not fit in the A* heap.
+    Each row costs 1 and every solution is size rows deep, so the first bound is
+    size and a solvable puzzle is solved in that first iteration: this is a
+    depth-first search that also cuts the children NonogramPuzzle.heuristic()
+    rules out (a column the remaining rows can no longer complete).
+    Returns (solution_node, states_explored, bound), where bound is the f-bound of
+    the successful iteration, or the next threshold (inf) when no solution exists.
+    """
+    root = SearchTreeNode(problem.initial_state, cost=0)
+    metrics = current_metrics()
+    budget = current_budget()
+    bound = root.cost + problem.heuristic(root.state)
+    states_explored = 0
+    while True:
+        next_bound = float('inf')
+        states_explored += 1
+        if budget is not None:
+            budget.tick()
+        if problem.goal_test(root.state):
+            return root, states_explored, bound
+        stack = [(root, problem.successors(root.state))]
+        while stack:
+            if metrics is not None:
+                metrics.frontier(len(stack))
+            node, children = stack[-1]
+            succ = next(children, None)
+            if succ is None:
+                stack.pop()
+                continue
+            # The child only points back to its parent, so finished branches are freed.
+            child = SearchTreeNode(succ, cost=node.cost + problem.cost(node.state, None, succ), parent=node)
+            f = child.cost + problem.heuristic(child.state)
+            if f > bound:
+                next_bound = min(next_bound, f)
+                if metrics is not None:
+                    metrics.prune("f-bound exceeded")
+                continue
+            states_explored += 1
+            if budget is not None:
+                budget.tick()
+            if problem.goal_test(child.state):
+                return child, states_explored, bound
+            stack.append((child, problem.successors(child.state)))
+        if verbose:
+            print(f"IDA*: no solution within bound {bound}, next threshold {next_bound}")
+        if next_bound == float('inf'):
+            return None, states_explored, next_bound
+        bound = next_bound
+
+def _meeting_profile(partial_col):
+    """(closed runs, length of the run touching the last cell) of a partial column."""
+    closed = 0
+    count = 0
+    for cell in partial_col:
+        if cell == '#':
+            count += 1
+        elif count > 0:
+            closed += 1
+            count = 0
+    return closed, count
+
+def bidirectional_search(problem, meeting_row=None):
+    """
+    Bidirectional row search: rows 0..m are filled from the top and rows R-1..m
+    from the bottom, where both halves include the meeting row m. Bottom halves
+    are indexed by (meeting row, per-column run profile at the meeting row); for
+    every top half the one compatible bottom profile is computed and looked up,
+    so joining costs a hash lookup instead of a search over the lower rows.
+    Each side is checked against its end of the column clues, so constraints
+    near the bottom prune the bottom half at half depth.
+    Returns (solution_node, states_explored, bottom_halves_indexed).
+    """
+    rows, cols = problem.num_rows, problem.num_cols
+    metrics = current_metrics()
+    budget = current_budget()
+    if rows == 0:
+        root = SearchTreeNode(problem.initial_state, cost=0)
+        return (root if problem.goal_test(root.state) else None), 1, 0
+    m = (rows - 1) // 2 if meeting_row is None else meeting_row
+    clues = [[] if clue == [0] else clue for clue in problem.column_clues]
+    reversed_clues = [clue[::-1] for clue in clues]
+    full = (1 << cols) - 1
+    states_explored = 0
+
+    def halves(row_order, column_clues):
+        # Depth-first enumeration of the consistent fillings of the rows in
+        # row_order, yielding them in that order (top-down or bottom-up).
+        nonlocal states_explored
+        stack = [[]]
+        while stack:
+            partial = stack.pop()
+            states_explored += 1
+            if budget is not None:
+                budget.tick()
+            if len(partial) == len(row_order):
+                yield partial
+                continue
+            if metrics is not None:
+                metrics.nodes_expanded += 1
+                metrics.frontier(len(stack))
+            may_fill, may_leave_empty = allowed_cells(column_bitsets(partial, cols), len(partial), column_clues, rows)
+            must_fill = full & ~may_leave_empty
+            row = row_order[len(partial)]
+            for option, mask in zip(problem.row_options[row], problem.row_masks[row]):
+                consistent = not (mask & ~may_fill or must_fill & ~mask)
+                if metrics is not None:
+                    metrics.consistency_checks += 1
+                if consistent:
+                    stack.append(partial + [option])
+                elif metrics is not None:
+                    metrics.prune("column prefix/suffix mismatch")
+
+    # Index every bottom half by the meeting row and its column profiles.
+    bottom_index = {}
+    for bottom in halves(list(range(rows - 1, m - 1, -1)), reversed_clues):
+        key = (tuple(bottom[-1]), tuple(_meeting_profile([row[col] for row in bottom]) for col in range(cols)))
+        bottom_index.setdefault(key, bottom)
+    if metrics is not None:
+        metrics.frontier(len(bottom_index))
+
+    for top in halves(list(range(m + 1)), clues):
+        required = []
+        for col in range(cols):
+            closed, open_run = _meeting_profile([row[col] for row in top])
+            clue = clues[col]
+            if open_run == 0:
+                required.append((len(clue) - closed, 0))
+            else:
+                # The run through the meeting row is counted by both halves.
+                required.append((len(clue) - closed - 1, clue[closed] - open_run + 1))
+        bottom = bottom_index.get((tuple(top[-1]), tuple(required)))
+        if bottom is not None:
+            grid = top + bottom[-2::-1]
+            return SearchTreeNode((rows, grid), cost=rows), states_explored, len(bottom_index)
+    return None, states_explored, len(bottom_index)
+
+def recorded_greedy_search(problem, exporter=None):
     """Greedy Search that records the search tree."""
     root = SearchTreeNode(problem.initial_state, cost=0)
+    record_child(None, root, exporter)
+    metrics = current_metrics()
+    budget = current_budget()
     frontier = []
     counter = 0
     heapq.heappush(frontier, (problem.heuristic(root.state), counter, root))
     states_explored = 0
     while frontier:
+        if metrics is not None:
+            metrics.frontier(len(frontier))
         priority, _, node = heapq.heappop(frontier)
         states_explored += 1
+        if budget is not None:
+            budget.tick()
         if problem.goal_test(node.state):
             return node, states_explored, root
         for succ in problem.successors(node.state):
             child = SearchTreeNode(succ, cost=node.cost + 1, parent=node)
-            node.children.append(child)
+            record_child(node, child, exporter)
             counter += 1
             heapq.heappush(frontier, (problem.heuristic(child.state), counter, child))
     return None, states_explored, root
 
-def recorded_astar_search(problem):
+def recorded_astar_search(problem, exporter=None):
     """A* Search that records the search tree."""
     root = SearchTreeNode(problem.initial_state, cost=0)
+    record_child(None, root, exporter)
+    metrics = current_metrics()
+    budget = current_budget()
     frontier = []
     counter = 0
     f = root.cost + problem.heuristic(root.state)
     heapq.heappush(frontier, (f, root.cost, counter, root))
     states_explored = 0
     while frontier:
+        if metrics is not None:
+            metrics.frontier(len(frontier))
         f, g, _, node = heapq.heappop(frontier)
         states_explored += 1
+        if budget is not None:
+            budget.tick()
         if problem.goal_test(node.state):
             return node, states_explored, root
         for succ in problem.successors(node.state):
             child = SearchTreeNode(succ, cost=node.cost + 1, parent=node)
-            node.children.append(child)
+            record_child(node, child, exporter)
             new_g = child.cost
             new_f = new_g + problem.heuristic(child.state)
             counter += 1
             heapq.heappush(frontier, (new_f, new_g, counter, child))
     return None, states_explored, root
 
+def _column_step(state, cell, clue, needed_after, remaining):
+    """
+    Advance one column's (closed runs, open run) state by one cell in O(1);
+    None means the column can no longer match its clue. needed_after[i] is the
+    number of cells that clue[i:] needs, gaps included.
+    """
+    if state is None:
+        return None
+    closed, open_run = state
+    if cell == '#':
+        open_run += 1
+        if closed >= len(clue) or open_run > clue[closed]:
+            return None
+        needed = clue[closed] - open_run + needed_after[closed + 1] + (closed + 1 < len(clue))
+    else:
+        if open_run:
+            if open_run != clue[closed]:
+                return None
+            closed, open_run = closed + 1, 0
+        needed = needed_after[closed]
+    return None if needed > remaining else (closed, open_run)
+
+def beam_search(problem, beam_width=64, deadline=None):
+    """
+    Anytime beam search: rows are added top-down, but instead of pruning
+    inconsistent grids every level keeps the beam_width grids with the fewest
+    column violations (columns that can no longer match their clue), so memory
+    is bounded by beam_width and a full grid is always reached. Each grid
+    carries a small per-column run state, so scoring a child costs O(C).
+    With a deadline (`deadline` in seconds, or the active SearchBudget's
+    deadline) a greedy pass comes first, then passes of beam_width,
+    2 * beam_width, ... until a solution is found or time runs out; without
+    one, a single pass of beam_width is made. When the time, or the active
+    budget, runs out, the best grid found so far is returned instead of
+    nothing: the best complete grid, or else the best grid of the deepest level.
+    Returns (best_node, violations, states_explored); best_node.state is
+    (rows_filled, grid), and violations == 0 with all rows filled is a solution.
+    best_node is None (and violations None) when some row has no candidates at
+    all, which proves the puzzle has no solution.
+    """
+    if not all(problem.row_options.values()):
+        return None, None, 0
+    metrics = current_metrics()
+    budget = current_budget()
+    stop_at = None if deadline is None else perf_counter() + deadline
+    if budget is not None and budget.deadline is not None:
+        stop_at = budget.deadline if stop_at is None else min(stop_at, budget.deadline)
+    rows, cols = problem.num_rows, problem.num_cols
+    clues = [[] if clue == [0] else clue for clue in problem.column_clues]
+    needed_after = []
+    for clue in clues:
+        needed = [0] * (len(clue) + 2)
+        for i in range(len(clue) - 1, -1, -1):
+            needed[i] = clue[i] + (needed[i + 1] + 1 if i + 1 < len(clue) else 0)
+        needed_after.append(needed)
+    states_explored = 0
+    best = None                 # (violations, grid) of the best complete grid
+    deepest = (0, [])
+    counter = 0                 # Tie-breaker: among equal scores the earliest generated grid wins
+
+    def result(violations, grid):
+        return SearchTreeNode((len(grid), grid), cost=len(grid)), violations, states_explored
+
+    # With a deadline, a greedy pass (width 1) comes first so a complete grid exists early.
+    width = 1 if stop_at is not None else beam_width
+    try:
+        while True:
+            beam = [(0, [], tuple((0, 0) for _ in range(cols)))]
+            for row_idx in range(problem.size):
+                remaining = rows - row_idx - 1
+                # Bounded max-heap of (-violations, -counter, grid, column states): worst kept grid on top.
+                heap = []
+                for violations, grid, states in beam:
+                    for option in problem.row_options[row_idx]:
+                        states_explored += 1
+                        counter += 1
+                        if metrics is not None:
+                            metrics.consistency_checks += 1
+                        if budget is not None:
+                            budget.tick()
+                        if stop_at is not None and perf_counter() > stop_at:
+                            raise TimeoutError
+                        # A child must beat the worst grid kept so far once the beam is full,
+                        # so scoring stops as soon as it has more violations than that grid.
+                        limit = -heap[0][0] - 1 if len(heap) == width else cols
+                        new_violations = 0
+                        new_states = []
+                        for col in range(cols):
+                            state = _column_step(states[col], option[col], clues[col], needed_after[col], remaining)
+                            if state is None:
+                                new_violations += 1
+                                if new_violations > limit:
+                                    break
+                            new_states.append(state)
+                        else:
+                            entry = (-new_violations, -counter, grid, option, tuple(new_states))
+                            if len(heap) < width:
+                                heapq.heappush(heap, entry)
+                            else:
+                                heapq.heapreplace(heap, entry)
+                if metrics is not None:
+                    metrics.nodes_expanded += len(beam)
+                    metrics.frontier(len(heap))
+                # Grids are only copied for the children that made it into the beam.
+                beam = [(-neg_violations, grid + [option], states)
+                        for neg_violations, _, grid, option, states in sorted(heap, key=lambda e: e[:2], reverse=True)]
+                deepest = beam[0][:2]
+            if best is None or deepest[0] < best[0]:
+                best = deepest
+            if best[0] == 0 or stop_at is None:
+                return result(*best)
+            width = beam_width if width < beam_width else width * 2
+    except (TimeoutError, SearchAborted):
+        pass
+    return result(*(best if best is not None else deepest))
+
 # -------------------------------
 # Function to print the search tree
 # -------------------------------
 
 def print_tree(node, indent=""):
     """
-    Recursively print the search tree.
+    Print the search tree.
     For each node, display the row index, cost, and a compact representation of the grid.
+    Walks the tree with an explicit stack, so deep trees do not hit the recursion limit.
+    For very large trees, stream them to a file with tree_export.SearchTreeExporter instead.
     """
-    row_idx, grid = node.state
-    grid_str = "[" + ", ".join("".join(row) for row in grid) + "]"
-    print(f"{indent}State(row_index={row_idx}, cost={node.cost}, grid={grid_str})")
-    for child in node.children:
-        print_tree(child, indent + "  ")
+    stack = [(node, indent)]
+    while stack:
+        node, indent = stack.pop()
+        row_idx, grid = node.state
+        grid_str = "[" + ", ".join("".join(row) for row in grid) + "]"
+        print(f"{indent}State(row_index={row_idx}, cost={node.cost}, grid={grid_str})")
+        stack.extend((child, indent + "  ") for child in reversed(node.children))
 
 # -------------------------------
 # Function to print the solution grid
@@ -327,34 +977,55 @@ def print_solution(state):
 # Main Execution: Setup Puzzle and Run Recorded Search Algorithms
 # -------------------------------
 
-# For a 5x5 puzzle, we update the size and clues accordingly.
-# In this example, the clues create a symmetric pattern (a cross-like shape).
-row_clues = [[1], [3], [5], [3], [1]]
-column_clues = [[1], [3], [5], [3], [1]]
-size = 5
-
-# Create a Nonogram puzzle instance.
-puzzle = NonogramPuzzle(row_clues, column_clues, size)
-
-# List of recorded search methods to apply.
-recorded_search_algorithms = [
-    ("Breadth-First Search", recorded_breadth_first_search),
-    ("Depth-First Search", recorded_depth_first_search),
-    ("Uniform-Cost Search", recorded_uniform_cost_search),
-    ("Depth-Limited DFS (limit=size)", lambda prob: recorded_depth_limited_search(prob, prob.size)),
-    ("Iterative Deepening DFS", recorded_iterative_deepening_search),
-    ("Greedy Search", recorded_greedy_search),
-    ("A* Search", recorded_astar_search)
-]
-
-print("Nonogram Puzzle Recorded Search Results (with search trees) for a 5x5 Puzzle:\n")
-for name, algorithm in recorded_search_algorithms:
-    solution_node, explored, tree_root = algorithm(puzzle)
-    print(f"--- {name} ---")
+if __name__ == "__main__":
+    # For a 5x5 puzzle, we update the size and clues accordingly.
+    # In this example, the clues create a symmetric pattern (a cross-like shape).
+    row_clues = [[1], [3], [5], [3], [1]]
+    column_clues = [[1], [3], [5], [3], [1]]
+    size = 5
+
+    # Create a Nonogram puzzle instance.
+    puzzle = NonogramPuzzle(row_clues, column_clues, size)
+    print(f"Arc consistency kept {puzzle.candidates_after} of {puzzle.candidates_before} row options "
+          f"({puzzle.pruning_ratio:.0%} pruned)\n")
+
+    # List of recorded search methods to apply.
+    recorded_search_algorithms = [
+        ("Breadth-First Search", recorded_breadth_first_search),
+        ("Depth-First Search", recorded_depth_first_search),
+        ("Uniform-Cost Search", recorded_uniform_cost_search),
+        ("Depth-Limited DFS (limit=size)", lambda prob: recorded_depth_limited_search(prob, prob.size)),
+        ("Iterative Deepening DFS", recorded_iterative_deepening_search),
+        ("Greedy Search", recorded_greedy_search),
+        ("A* Search", recorded_astar_search)
+    ]
+
+    print("Nonogram Puzzle Recorded Search Results (with search trees) for a 5x5 Puzzle:\n")
+    for name, algorithm in recorded_search_algorithms:
+        solution_node, explored, tree_root = algorithm(puzzle)
+        print(f"--- {name} ---")
+        print(f"States explored: {explored}")
+        if explored >= 120:
+            print("WARNING: Explored states exceed 120!")
+        print_solution(solution_node.state if solution_node else None)
+        print("Search Tree:")
+        print_tree(tree_root)
+        print("\n" + "="*60 + "\n")
+
+    solution_node, explored, bound = iterative_deepening_astar_search(puzzle)
+    print("--- IDA* Search (no search tree recorded) ---")
     print(f"States explored: {explored}")
-    if explored >= 120:
-        print("WARNING: Explored states exceed 120!")
+    print(f"Final f-bound: {bound}")
     print_solution(solution_node.state if solution_node else None)
-    print("Search Tree:")
-    print_tree(tree_root)
-    print("\n" + "="*60 + "\n")
+
+    solution_node, explored, indexed = bidirectional_search(puzzle)
+    print("--- Bidirectional Search (no search tree recorded) ---")
+    print(f"States explored: {explored}")
+    print(f"Bottom halves indexed: {indexed}")
+    print_solution(solution_node.state if solution_node else None)
+
+    solution_node, violations, explored = beam_search(puzzle, beam_width=8)
+    print("--- Beam Search (width 8, no search tree recorded) ---")
+    print(f"States explored: {explored}")
+    print(f"Column violations: {violations}")
+    print_solution(solution_node.state)
@@ -0,0 +1,3 @@
+from .onlinesolver import NonogramSolver
+
+__all__ = ["NonogramSolver"]
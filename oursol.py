@@ -1,36 +1,12 @@
 from itertools import combinations, product
+from time import perf_counter
+
+from budget import SearchAborted, current_budget
+from line_cache import line_candidates
+from metrics import current_metrics
 
 def generate_row_combinations(row_clue, size):
-    if row_clue == [0]:  # Special case: fully empty row
-        return [['_'] * size]
-    
-    total_blocks = sum(row_clue)
-    num_gaps = len(row_clue) - 1
-    total_empty = size - total_blocks - num_gaps
-
-    results = []
-
-    def backtrack(idx, pos, row):
-        if idx == len(row_clue):
-            results.append(row[:])
-            return
-
-        block_size = row_clue[idx]
-        for i in range(pos, size - block_size + 1):
-            # Check if enough space is left
-            if any(cell == '#' for cell in row[i:i+block_size]):
-                continue
-            if idx > 0 and row[i - 1] != '_':
-                continue
-            new_row = row[:]
-            new_row[i:i + block_size] = ['#'] * block_size
-            if i + block_size < size:
-                new_row[i + block_size] = '_'
-            backtrack(idx + 1, i + block_size + 1, new_row)
-
-    row = ['_'] * size
-    backtrack(0, 0, row)
-    return results
+    return [list(row) for row in line_candidates(row_clue, size, empty='_', filled='#')]
 
 def generate_all_row_combinations(row_clues, size):
     return {i: generate_row_combinations(row_clue, size) for i, row_clue in enumerate(row_clues)}
@@ -61,18 +37,59 @@ def extract_column_clues(grid):
 def grid_matches_column_clues(grid, column_clues):
     return extract_column_clues(grid) == column_clues
 
-def generate_valid_grids(row_combinations, column_clues):
+def iter_valid_grids(row_combinations, column_clues, limit=None, deadline=None):
+    """
+    Yield the valid grids (tuples of rows) one at a time, in the order
+    generate_valid_grids() lists them. itertools.product walks the row
+    combinations lazily, so only the current grid is held. Stops after
+    `limit` grids; the generator's return value (StopIteration.value) is the
+    number of states checked. Once `deadline` seconds have passed it raises
+    SearchAborted('timeout') instead, so a cut-off enumeration is never
+    mistaken for a complete one.
+    """
     all_possible_rows = [row_combinations[i] for i in range(len(row_combinations))]
     
-    valid_grids = []
     total_states = 0
+    found = 0
+    metrics = current_metrics()
+    budget = current_budget()
+    stop_at = None if deadline is None else perf_counter() + deadline
+    if limit is not None and limit <= 0:
+        return total_states
 
     for grid in product(*all_possible_rows):
+        if stop_at is not None and perf_counter() > stop_at:
+            raise SearchAborted("timeout", total_states)
         total_states += 1
-        if grid_matches_column_clues(grid, column_clues):
-            valid_grids.append(grid)
+        if budget is not None:
+            budget.tick()
+        if metrics is None:
+            matches = grid_matches_column_clues(grid, column_clues)
+        else:
+            # Every complete grid is a goal test; there is no partial pruning here.
+            start = perf_counter()
+            matches = grid_matches_column_clues(grid, column_clues)
+            metrics.goal_test_time += perf_counter() - start
+            metrics.consistency_checks += 1
+            if not matches:
+                metrics.prune("column clues mismatch")
+        if matches:
+            yield grid
+            found += 1
+            if limit is not None and found >= limit:
+                break
+
+    return total_states
 
-    return valid_grids, total_states
+def generate_valid_grids(row_combinations, column_clues):
+    # Collects every valid grid; use iter_valid_grids() to stream them instead.
+    valid_grids = []
+    stream = iter_valid_grids(row_combinations, column_clues)
+    while True:
+        try:
+            valid_grids.append(next(stream))
+        except StopIteration as stop:
+            return valid_grids, stop.value
 
 def print_grid_count_and_grids(valid_grids, total_states):
     print(f"Total possible states: {total_states}")
@@ -83,21 +100,23 @@ def print_grid_count_and_grids(valid_grids, total_states):
             print(''.join(row))
         print(' ' * len(grid[0]))
 
-# Example Usage
-column_clues = [[2], [2], [1,1], [1]]
-row_clues = [[1], [0], [4], [2]]
-column_clues = [[1], [2], [2], [2]]
-row_clues = [[1], [1,1], [2], [2]]
-# row_clues = [[2], [4], [1, 1], [1], [2], [1]]
-# column_clues = [[2], [1], [2, 1], [5], [1], [0]]
-# column_clues = [[2],[1,3],[1,1,3],[2,7],[4,3],[2,4],[3,1],[2,1,1],[1,3],[1,1,3]]
-# row_clues = [[3,1,1],[6],[1,1,2],[6],[1,1],[1,5],[1,1,2],[4,3],[5],[5]]
+if __name__ == "__main__":
+    # Example Usage
+    column_clues = [[2], [2], [1,1], [1]]
+    row_clues = [[1], [0], [4], [2]]
+    column_clues = [[1], [2], [2], [2]]
+    row_clues = [[1], [1,1], [2], [2]]
+    # row_clues = [[2], [4], [1, 1], [1], [2], [1]]
+    # column_clues = [[2], [1], [2, 1], [5], [1], [0]]
+    # column_clues = [[2],[1,3],[1,1,3],[2,7],[4,3],[2,4],[3,1],[2,1,1],[1,3],[1,1,3]]
+    # row_clues = [[3,1,1],[6],[1,1,2],[6],[1,1],[1,5],[1,1,2],[4,3],[5],[5]]
 
 
-size = 4
+    # Rows are as wide as there are column clues, so rectangular puzzles work too.
+    size = len(column_clues)
 
-row_combinations = generate_all_row_combinations(row_clues, size)
+    row_combinations = generate_all_row_combinations(row_clues, size)
 
-valid_grids, total_states = generate_valid_grids(row_combinations, column_clues)
+    valid_grids, total_states = generate_valid_grids(row_combinations, column_clues)
 
-print_grid_count_and_grids(valid_grids, total_states)
+    print_grid_count_and_grids(valid_grids, total_states)
@@ -1,79 +1,129 @@
 from itertools import product
+from time import perf_counter
 from typing import List
 
-def generate_row_combinations(clue: List[int], size: int) -> List[List[str]]:
-    if clue == [0]:
-        return [['_'] * size]
-    
-    total_blocks = sum(clue)
-    gaps = len(clue) - 1
-    total_empty = size - total_blocks - gaps
-
-    results = []
-
-    def backtrack(idx, pos, row):
-        if idx == len(clue):
-            results.append(row[:])
-            return
-        
-        block = clue[idx]
-        for i in range(pos, size - block + 1):
-            if any(cell == '#' for cell in row[i:i+block]):
-                continue
-            if i > 0 and row[i-1] == '#':
-                continue
-            new_row = row[:]
-            new_row[i:i+block] = ['#'] * block
-            if i + block < size:
-                new_row[i+block] = '_'
-            backtrack(idx + 1, i + block + 1, new_row)
-
-    backtrack(0, 0, ['_'] * size)
-    return results
+from budget import SearchAborted, current_budget
+from line_cache import line_candidates
+from metrics import current_metrics
 
-def solve_nonogram(m: int, row_clues: List[List[int]], col_clues: List[List[int]]):
-    row_options = [generate_row_combinations(clue, m) for clue in row_clues]
+def generate_row_combinations(clue: List[int], size: int) -> List[List[str]]:
+    return [list(row) for row in line_candidates(clue, size, empty='_', filled='#')]
+
+def iter_solutions(row_clues: List[List[int]], col_clues: List[List[int]], limit=None, deadline=None):
+    """
+    Yield the solutions one at a time, in the order solve_nonogram() lists
+    them, each as a new list of '#'/'_' rows. The search is an explicit-stack
+    DFS that keeps only the current path (the rows placed so far and one
+    iterator over the row options per level), so memory stays O(rows) however
+    many solutions there are. Stops after `limit` solutions; the generator's
+    return value (StopIteration.value) is the number of game states processed.
+    Once `deadline` seconds have passed it raises SearchAborted('timeout')
+    instead, so a cut-off enumeration is never mistaken for a complete one.
+    """
+    rows, cols = len(row_clues), len(col_clues)
+    row_options = [generate_row_combinations(clue, cols) for clue in row_clues]
     col_targets = [sum(clue) for clue in col_clues]
-    solutions = []
     game_state_counter = 0
-
-    def backtrack(grid: List[List[str]], row: int, col_counts: List[int]):
-        nonlocal game_state_counter
-
-        if row == m:
-            # All rows placed, check if final column counts match the clues
-            for j in range(m):
-                if generate_clue([grid[i][j] for i in range(m)]) != col_clues[j]:
-                    return
-            solutions.append([row[:] for row in grid])
-            return
-
-        for option in row_options[row]:
-            new_col_counts = col_counts[:]
-            valid = True
-
-            for j in range(m):
-                if option[j] == '#':
-                    new_col_counts[j] += 1
-                    # Condition 1: Too many shaded cells
-                    if new_col_counts[j] > col_targets[j]:
-                        valid = False
-                        break
-                    # Condition 2: Not enough space left
-                    remaining_rows = m - row - 1
-                    if remaining_rows < col_targets[j] - new_col_counts[j]:
-                        valid = False
-                        break
-
+    found = 0
+    metrics = current_metrics()
+    budget = current_budget()
+    stop_at = None if deadline is None else perf_counter() + deadline
+    grid = []
+
+    def complete():
+        # All rows placed, check if final column counts match the clues
+        start = perf_counter() if metrics is not None else 0
+        for j in range(cols):
+            if generate_clue([grid[i][j] for i in range(rows)]) != col_clues[j]:
+                if metrics is not None:
+                    metrics.goal_test_time += perf_counter() - start
+                    metrics.prune("column clues mismatch")
+                return False
+        if metrics is not None:
+            metrics.goal_test_time += perf_counter() - start
+        return True
+
+    if limit is not None and limit <= 0:
+        return game_state_counter
+    if rows == 0:
+        if complete():
+            yield []
+        return game_state_counter
+
+    if metrics is not None:
+        metrics.nodes_expanded += 1
+        metrics.frontier(1)
+    # stack[row] holds the options still to try for that row and the column counts above it.
+    stack = [(iter(row_options[0]), [0] * cols)]
+    while stack:
+        if stop_at is not None and perf_counter() > stop_at:
+            raise SearchAborted("timeout", game_state_counter)
+        row = len(stack) - 1
+        options, col_counts = stack[-1]
+        option = next(options, None)
+        if option is None:
+            stack.pop()
+            if stack:
+                grid.pop()
+            continue
+        start = perf_counter() if metrics is not None else 0
+        new_col_counts = col_counts[:]
+        valid = True
+        reason = None
+
+        for j in range(cols):
+            if option[j] == '#':
+                new_col_counts[j] += 1
+                # Condition 1: Too many shaded cells
+                if new_col_counts[j] > col_targets[j]:
+                    valid = False
+                    reason = "too many shaded cells"
+                    break
+                # Condition 2: Not enough space left
+                remaining_rows = rows - row - 1
+                if remaining_rows < col_targets[j] - new_col_counts[j]:
+                    valid = False
+                    reason = "not enough space left"
+                    break
+
+        if metrics is not None:
+            metrics.consistency_checks += 1
+            metrics.successor_time += perf_counter() - start
             if not valid:
-                continue
+                metrics.prune(reason)
+
+        if not valid:
+            continue
+
+        game_state_counter += 1
+        if budget is not None:
+            budget.tick()
+        grid.append(option)
+        if row + 1 < rows:
+            if metrics is not None:
+                metrics.nodes_expanded += 1
+                metrics.frontier(row + 2)
+            stack.append((iter(row_options[row + 1]), new_col_counts))
+            continue
+        if complete():
+            yield [placed[:] for placed in grid]
+            found += 1
+            if limit is not None and found >= limit:
+                break
+        grid.pop()
+    return game_state_counter
 
-            game_state_counter += 1
-            backtrack(grid + [option], row + 1, new_col_counts)
-
-    backtrack([], 0, [0] * m)
-
-    return solutions, game_state_counter
+def solve_nonogram(m: int, row_clues: List[List[int]], col_clues: List[List[int]]):
+    # The grid is len(row_clues) x len(col_clues); m is only kept for the old
+    # square call style and is not used.
+    # Collects every solution; use iter_solutions() to stream them instead.
+    solutions = []
+    stream = iter_solutions(row_clues, col_clues)
+    while True:
+        try:
+            solutions.append(next(stream))
+        except StopIteration as stop:
+            return solutions, stop.value
 
 def generate_clue(line: List[str]) -> List[int]:
     clues = []
@@ -89,18 +139,23 @@ def generate_clue(line: List[str]) -> List[int]:
         clues.append(count)
     return clues if clues else [0]
 
-# Example usage
-m = 4
-col_clues = [[1], [2], [2], [2]]
-row_clues = [[1], [1, 1], [2], [2]]
+if __name__ == "__main__":
+    # Example usage
+    m = 4
+    col_clues = [[1], [2], [2], [2]]
+    row_clues = [[1], [1, 1], [2], [2]]
+
+    solutions, game_states = solve_nonogram(m, row_clues, col_clues)
 
-solutions, game_states = solve_nonogram(m, row_clues, col_clues)
+    print(f"Total game states processed: {game_states}")
+    print(f"Number of valid solutions: {len(solutions)}\n")
 
-print(f"Total game states processed: {game_states}")
-print(f"Number of valid solutions: {len(solutions)}\n")
+    for sol_num, grid in enumerate(solutions, 1):
+        print(f"Solution {sol_num}:")
+        for row in grid:
+            print(''.join(row))
+        print("-" * m)
 
-for sol_num, grid in enumerate(solutions, 1):
-    print(f"Solution {sol_num}:")
-    for row in grid:
-        print(''.join(row))
-    print("-" * m)
+    # Streaming: a 10x10 permutation puzzle has 10! solutions; take the first three.
+    for sol_num, grid in enumerate(iter_solutions([[1]] * 10, [[1]] * 10, limit=3), 1):
+        print(f"Permutation solution {sol_num}: {' '.join(''.join(row) for row in grid)}")
@@ -0,0 +1,219 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tracemalloc
+from glob import glob
+
+import line_cache
+import solver
+from draw_nonogram import read_nonogram_csv
+from generatenonogram import generate_clue
+
+# -------------------------------
+# Performance regression harness
+# -------------------------------
+# Runs a pinned corpus through the engines and compares the measurements
+# with perf_baseline.json, which is kept in the repository:
+#
+#     python perf_regress.py record     # write a new baseline
+#     python perf_regress.py check      # compare; exit status 1 on a regression
+#
+# The corpus is the CSV fixtures (the *_problem.csv files and
+# nonogram_csv/*_blank.csv), puzzles generated from fixed seeds, and a few
+# contradictory puzzles that every engine must answer 'unsolvable'. For
+# every (engine, puzzle) pair the harness records states explored, wall time
+# and peak traced memory. The line cache is cleared before every run, so
+# candidate generation is part of what is measured.
+#
+# States explored are deterministic and compared exactly. Times are noisy:
+# each run is repeated and the median is compared against
+#     baseline median * (1 + time_tolerance) + noise * (baseline MAD + current MAD) + min_time
+# where MAD is the median absolute deviation of the repeats, so jittery
+# measurements need a larger slowdown to be flagged. A pair over the threshold
+# is measured again with three times the repeats before it counts. Memory is measured once
+# per pair with tracemalloc (which would distort the timings) and flagged
+# beyond memory_tolerance plus a small absolute slack.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "perf_baseline.json")
+
+# The stochastic 'anneal' engine is left out: its states explored change from run to run.
+DEFAULT_ENGINES = ["astar", "backtrack", "backtrack-all", "beam", "bfs", "bfs-spill", "bidirectional",
+                   "brute-force", "cell-bfs", "cell-dfs", "dfs", "greedy", "idastar", "ids", "propagation", "ucs"]
+
+# Largest puzzle side each engine is run on; the others are fine on the whole corpus.
+MAX_SIZE = {"brute-force": 5, "cell-bfs": 5, "cell-dfs": 6, "backtrack-all": 8}
+
+# Seeded random puzzles: (side, fill density, seed).
+GENERATED = [(6, 0.5, 1), (6, 0.6, 2), (8, 0.5, 3), (8, 0.6, 4), (10, 0.55, 5), (10, 0.6, 6),
+             (15, 0.55, 7), (20, 0.6, 8)]
+
+# Contradictory puzzles: (name, row_clues, column_clues). A clue longer than its
+# line has no candidates at all, which the preprocessing must report as no solution.
+CONTRADICTORY = [("contradictory-row-too-long", [[3], [1]], [[1], [1]]),
+                 ("contradictory-column-too-long", [[1], [1]], [[3], [1]]),
+                 ("contradictory-counts", [[2], [0]], [[1], [0]])]
+
+
+def _parse_clue(text):
+    clue = json.loads(text)
+    return clue if isinstance(clue, list) else [clue]
+
+
+def load_corpus():
+    """Return the pinned corpus as a list of (name, row_clues, column_clues)."""
+    corpus = []
+    paths = (sorted(glob(os.path.join(HERE, "*_problem.csv")))
+             + sorted(glob(os.path.join(HERE, "nonogram_csv", "*_blank.csv"))))
+    for path in paths:
+        column_clues, row_clues, _ = read_nonogram_csv(path)
+        corpus.append((os.path.relpath(path, HERE), [_parse_clue(clue) for clue in row_clues],
+                       [_parse_clue(clue) for clue in column_clues]))
+    for size, density, seed in GENERATED:
+        rng = random.Random(seed)
+        grid = [['#' if rng.random() < density else '_' for _ in range(size)] for _ in range(size)]
+        corpus.append((f"random-{size}x{size}-{density}-{seed}", [generate_clue(row) for row in grid],
+                       [generate_clue(list(col)) for col in zip(*grid)]))
+    corpus.extend(CONTRADICTORY)
+    return corpus
+
+
+def _run(row_clues, column_clues, engine, deadline):
+    # Like timeit, with the cyclic garbage collector off, so collections that
+    # happen to fall inside one run do not show up as jitter in time or memory.
+    line_cache.clear_cache()
+    gc.collect()
+    gc.disable()
+    try:
+        return solver.solve((row_clues, column_clues), engine=engine, deadline=deadline)
+    finally:
+        gc.enable()
+
+
+def measure_one(engine, row_clues, column_clues, repeats=5, deadline=10.0):
+    times = []
+    for _ in range(repeats):
+        result = _run(row_clues, column_clues, engine, deadline)
+        times.append(result.stats["wall_time"])
+    tracemalloc.start()
+    _run(row_clues, column_clues, engine, deadline)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    median = statistics.median(times)
+    return {
+        "status": result.status,
+        "states_explored": result.stats["states_explored"],
+        "time_median": median,
+        "time_mad": statistics.median(abs(t - median) for t in times),
+        "peak_memory": peak,
+    }
+
+
+def measure(engines=None, repeats=5, deadline=10.0, verbose=False):
+    """Run the corpus and return {"engine/puzzle": measurement} plus environment details."""
+    results = {}
+    for engine in engines or DEFAULT_ENGINES:
+        for name, row_clues, column_clues in load_corpus():
+            if max(len(row_clues), len(column_clues)) > MAX_SIZE.get(engine, sys.maxsize):
+                continue
+            measurement = results[f"{engine}/{name}"] = measure_one(engine, row_clues, column_clues, repeats, deadline)
+            if verbose:
+                print(f"{engine:>14} {name:<40} {measurement['status']:<10} "
+                      f"{measurement['states_explored']:>8} states {measurement['time_median'] * 1000:9.2f} ms "
+                      f"{measurement['peak_memory'] / 1024:9.1f} KB")
+    return {
+        "environment": {"python": platform.python_version(), "machine": platform.machine(),
+                        "system": platform.system(), "repeats": repeats},
+        "results": results,
+    }
+
+
+def slower(old, new, time_tolerance=0.25, noise=2.0, min_time=0.001):
+    """Whether the measurement `new` is slower than `old` beyond the noise-aware threshold."""
+    slack = noise * (old["time_mad"] + new["time_mad"]) + min_time
+    return new["time_median"] > old["time_median"] * (1 + time_tolerance) + slack
+
+
+def confirm(baseline, current, repeats=15, time_tolerance=0.25, noise=2.0):
+    """
+    Re-measure, with more repeats, every pair that looks slower than the
+    baseline, and keep the new measurement in `current`: a one-off stall
+    during the first measurement is then not reported as a regression.
+    """
+    corpus = {name: (row_clues, column_clues) for name, row_clues, column_clues in load_corpus()}
+    for key, new in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is not None and slower(old, new, time_tolerance, noise):
+            engine, name = key.split("/", 1)
+            current["results"][key] = measure_one(engine, *corpus[name], repeats)
+
+
+def compare(baseline, current, time_tolerance=0.25, noise=2.0, memory_tolerance=0.10, min_memory=16 * 1024):
+    """
+    Return (regressions, improvements, notes) as lists of messages comparing
+    the measurements `current` against `baseline`.
+    """
+    regressions, improvements, notes = [], [], []
+    if baseline["environment"] != current["environment"]:
+        notes.append(f"environment differs: baseline {baseline['environment']}, now {current['environment']}")
+    old_results, new_results = baseline["results"], current["results"]
+    for key in sorted(old_results.keys() - new_results.keys()):
+        notes.append(f"{key}: not run")
+    for key in sorted(new_results.keys() - old_results.keys()):
+        notes.append(f"{key}: not in the baseline")
+    for key in sorted(old_results.keys() & new_results.keys()):
+        old, new = old_results[key], new_results[key]
+        if new["status"] != old["status"]:
+            regressions.append(f"{key}: status {old['status']} -> {new['status']}")
+        if new["states_explored"] > old["states_explored"]:
+            regressions.append(f"{key}: states explored {old['states_explored']} -> {new['states_explored']}")
+        elif new["states_explored"] < old["states_explored"]:
+            improvements.append(f"{key}: states explored {old['states_explored']} -> {new['states_explored']}")
+        if slower(old, new, time_tolerance, noise):
+            regressions.append(f"{key}: time {old['time_median'] * 1000:.2f} ms -> {new['time_median'] * 1000:.2f} ms")
+        elif slower(new, old, time_tolerance, noise):
+            improvements.append(f"{key}: time {old['time_median'] * 1000:.2f} ms -> {new['time_median'] * 1000:.2f} ms")
+        if new["peak_memory"] > old["peak_memory"] * (1 + memory_tolerance) + min_memory:
+            regressions.append(f"{key}: peak memory {old['peak_memory'] / 1024:.1f} KB -> {new['peak_memory'] / 1024:.1f} KB")
+    return regressions, improvements, notes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine performance regression harness")
+    parser.add_argument("command", choices=["record", "check"])
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--engines", nargs="+", help="engines to run (default: all deterministic ones)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--noise", type=float, default=2.0, help="MADs of jitter allowed on top")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    current = measure(args.engines, args.repeats, verbose=args.verbose)
+    if args.command == "record":
+        with open(args.baseline, mode='w') as file:
+            json.dump(current, file, indent=1, sort_keys=True)
+            file.write("\n")
+        print(f"Recorded {len(current['results'])} measurements in {args.baseline}")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    confirm(baseline, current, 3 * args.repeats, args.time_tolerance, args.noise)
+    regressions, improvements, notes = compare(baseline, current, args.time_tolerance, args.noise)
+    for title, messages in (("Notes", notes), ("Improvements", improvements), ("Regressions", regressions)):
+        if messages:
+            print(f"{title}:")
+            for message in messages:
+                print(f"  {message}")
+    print(f"{len(current['results'])} measurements, {len(regressions)} regressions, {len(improvements)} improvements")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
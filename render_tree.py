@@ -0,0 +1,303 @@
+import json
+from xml.sax.saxutils import escape
+
+# -------------------------------
+# Scalable search tree rendering
+# -------------------------------
+# The notebooks used to load every node into networkx and lay it out with
+# matplotlib, which hangs beyond 4x4. Here only a bounded set of nodes is
+# drawn: each node keeps at most `max_children` children, at most `max_nodes`
+# nodes are drawn in total (the collapsed ones included), and the hidden
+# siblings are collapsed into one "+k more" node. Node totals are still reported per depth. The layout is a
+# simple layered tree computed in one pass, written straight to SVG or PNG,
+# so render time depends on the drawn nodes only.
+
+CHAR_WIDTH = 7
+LINE_HEIGHT = 13
+PADDING = 6
+H_GAP = 12
+V_GAP = 40
+LEFT_MARGIN = 150
+
+
+class DrawNode:
+    def __init__(self, label, depth, parent=None, hidden=0):
+        self.label = label            # List of text lines shown in the box
+        self.depth = depth            # Depth in the search tree
+        self.parent = parent          # Parent DrawNode
+        self.hidden = hidden          # Number of siblings this node stands for (collapsed node)
+        self.children = []
+        self.x = 0.0
+        self.y = 0.0
+
+    @property
+    def width(self):
+        return max(len(line) for line in self.label) * CHAR_WIDTH + 2 * PADDING
+
+    @property
+    def height(self):
+        return len(self.label) * LINE_HEIGHT + 2 * PADDING
+
+
+class DrawTree:
+    def __init__(self, root, depth_counts):
+        self.root = root
+        self.depth_counts = depth_counts   # Total nodes per depth in the full tree
+        self.drawn = 0
+
+    def nodes(self):
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+
+def grid_label(row_idx, cost, grid):
+    """Label lines for a (row_index, grid) state: header plus one line per row."""
+    return [f"R{row_idx} | C{cost}"] + ["".join(row) for row in grid]
+
+
+def _collapsed(count, depth, parent):
+    return DrawNode([f"+{count} more"], depth, parent, hidden=count)
+
+
+def _build(root_item, root_label, expand, max_children, max_nodes):
+    """
+    Breadth-first construction of the drawn tree.
+    expand(item, depth) returns (number_of_children, iterator of (child_item, label)).
+    Only the first max_children children of each node are pulled from the
+    iterator; the rest are summarised by their count. The collapsed nodes count
+    toward max_nodes, and once it is reached no more nodes are added.
+    """
+    root = DrawNode(root_label, 0)
+    drawn = 1
+    level = [(root, root_item)]
+    while level:
+        next_level = []
+        for node, item in level:
+            if drawn >= max_nodes:
+                break
+            total, children = expand(item, node.depth)
+            shown = 0
+            for child_item, label in children:
+                # Keep a slot for the "+k more" node while siblings are left after this one.
+                needed = 1 if shown + 1 == total else 2
+                if shown >= max_children or drawn + needed > max_nodes:
+                    break
+                child = DrawNode(label, node.depth + 1, node)
+                node.children.append(child)
+                next_level.append((child, child_item))
+                shown += 1
+                drawn += 1
+            if total > shown and drawn < max_nodes:
+                node.children.append(_collapsed(total - shown, node.depth + 1, node))
+                drawn += 1
+        level = next_level
+    return root, drawn
+
+
+def tree_from_search(root, max_children=4, max_nodes=200):
+    """Build a drawable tree from a recorded SearchTreeNode tree (see newcode.py)."""
+    depth_counts = []
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if depth == len(depth_counts):
+            depth_counts.append(0)
+        depth_counts[depth] += 1
+        stack.extend((child, depth + 1) for child in node.children)
+
+    def expand(node, depth):
+        return len(node.children), ((c, grid_label(c.state[0], c.cost, c.state[1])) for c in node.children)
+
+    draw_root, drawn = _build(root, grid_label(root.state[0], root.cost, root.state[1]),
+                              expand, max_children, max_nodes)
+    tree = DrawTree(draw_root, depth_counts)
+    tree.drawn = drawn
+    return tree
+
+
+def tree_from_row_combinations(row_combinations, max_children=4, max_nodes=200):
+    """
+    Build a drawable full expansion tree (no pruning) from row combinations,
+    without enumerating it: per-depth totals are products of the option counts.
+    """
+    num_rows = len(row_combinations)
+    depth_counts = [1]
+    for level in range(num_rows):
+        depth_counts.append(depth_counts[-1] * len(row_combinations[level]))
+
+    def expand(grid, depth):
+        if depth >= num_rows:
+            return 0, iter(())
+        options = row_combinations[depth]
+        return len(options), ((grid + [row], grid_label(depth + 1, depth + 1, grid + [row]))
+                              for row in options)
+
+    draw_root, drawn = _build([], grid_label(0, 0, []), expand, max_children, max_nodes)
+    tree = DrawTree(draw_root, depth_counts)
+    tree.drawn = drawn
+    return tree
+
+
+def tree_from_jsonl(path, max_children=4, max_nodes=200):
+    """
+    Build a drawable tree from a JSONL file written by tree_export.SearchTreeExporter.
+    The file is streamed once; only drawn nodes are kept in memory.
+    """
+    depth_counts = []
+    drawn_by_id = {}
+    shown = {}
+    hidden = {}
+    root = None
+    drawn = 0
+    with open(path) as file:
+        for line in file:
+            record = json.loads(line)
+            depth = record["row_index"]
+            while len(depth_counts) <= depth:
+                depth_counts.append(0)
+            depth_counts[depth] += 1
+            parent_id = record["parent"]
+            label = [f"R{depth} | C{record['cost']}"] + record["grid"]
+            if parent_id is None:
+                if root is None:
+                    root = DrawNode(label, 0)
+                    drawn_by_id[record["id"]] = root
+                    drawn += 1
+                continue
+            parent = drawn_by_id.get(parent_id)
+            if parent is None:
+                continue
+            if shown.get(parent_id, 0) >= max_children or drawn >= max_nodes:
+                hidden[parent_id] = hidden.get(parent_id, 0) + 1
+                continue
+            child = DrawNode(label, parent.depth + 1, parent)
+            parent.children.append(child)
+            drawn_by_id[record["id"]] = child
+            shown[parent_id] = shown.get(parent_id, 0) + 1
+            drawn += 1
+    if root is None:
+        raise ValueError(f"No root node found in {path}")
+    for parent_id, count in hidden.items():
+        parent = drawn_by_id[parent_id]
+        parent.children.append(_collapsed(count, parent.depth + 1, parent))
+        drawn += 1
+    tree = DrawTree(root, depth_counts)
+    tree.drawn = drawn
+    return tree
+
+
+def layout(tree):
+    """
+    Layered tidy layout in O(drawn nodes): leaves are placed left to right,
+    parents are centred above their children, depth gives the row.
+    Returns the (width, height) of the drawing.
+    """
+    level_heights = {}
+    for node in tree.nodes():
+        level_heights[node.depth] = max(level_heights.get(node.depth, 0), node.height)
+    level_y = {}
+    y = V_GAP // 2
+    for depth in sorted(level_heights):
+        level_y[depth] = y
+        y += level_heights[depth] + V_GAP
+
+    next_x = LEFT_MARGIN
+    # Iterative post-order so deep trees do not hit the recursion limit.
+    stack = [(tree.root, False)]
+    while stack:
+        node, visited = stack.pop()
+        node.y = level_y[node.depth]
+        if not node.children:
+            node.x = next_x + node.width / 2
+            next_x += node.width + H_GAP
+        elif visited:
+            node.x = (node.children[0].x + node.children[-1].x) / 2
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+    return next_x + H_GAP, y
+
+
+def _depth_captions(tree):
+    captions = []
+    for depth, total in enumerate(tree.depth_counts):
+        captions.append((depth, f"depth {depth}: {total} nodes"))
+    return captions
+
+
+def write_svg(tree, path, title="Search Tree"):
+    width, height = layout(tree)
+    level_y = {node.depth: node.y for node in tree.nodes()}
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{int(width)}" height="{int(height) + 30}" '
+             f'font-family="monospace" font-size="11">',
+             f'<text x="{PADDING}" y="16" font-size="14">{escape(title)} '
+             f'({tree.drawn} of {sum(tree.depth_counts)} nodes drawn)</text>',
+             '<g transform="translate(0,30)">']
+    for depth, caption in _depth_captions(tree):
+        if depth in level_y:
+            parts.append(f'<text x="{PADDING}" y="{level_y[depth] + LINE_HEIGHT}">{escape(caption)}</text>')
+    for node in tree.nodes():
+        if node.parent is not None:
+            parts.append(f'<line x1="{node.parent.x:.1f}" y1="{node.parent.y + node.parent.height}" '
+                         f'x2="{node.x:.1f}" y2="{node.y}" stroke="grey"/>')
+    for node in tree.nodes():
+        left = node.x - node.width / 2
+        fill = "lightgrey" if node.hidden else "lightblue"
+        parts.append(f'<rect x="{left:.1f}" y="{node.y}" width="{node.width}" height="{node.height}" '
+                     f'fill="{fill}" stroke="black"/>')
+        for i, line in enumerate(node.label):
+            parts.append(f'<text x="{left + PADDING:.1f}" y="{node.y + PADDING + (i + 1) * LINE_HEIGHT - 3}">'
+                         f'{escape(line)}</text>')
+    parts.append('</g></svg>\n')
+    with open(path, mode='w') as file:
+        file.write("\n".join(parts))
+
+
+def write_png(tree, path, title="Search Tree"):
+    from PIL import Image, ImageDraw, ImageFont
+
+    width, height = layout(tree)
+    img = Image.new("RGB", (int(width), int(height) + 30), "white")
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+    draw.text((PADDING, 6), f"{title} ({tree.drawn} of {sum(tree.depth_counts)} nodes drawn)",
+              fill="black", font=font)
+    level_y = {node.depth: node.y + 30 for node in tree.nodes()}
+    for depth, caption in _depth_captions(tree):
+        if depth in level_y:
+            draw.text((PADDING, level_y[depth] + PADDING), caption, fill="black", font=font)
+    for node in tree.nodes():
+        if node.parent is not None:
+            draw.line([(node.parent.x, node.parent.y + node.parent.height + 30), (node.x, node.y + 30)],
+                      fill="grey")
+    for node in tree.nodes():
+        left = node.x - node.width / 2
+        top = node.y + 30
+        fill = "lightgrey" if node.hidden else "lightblue"
+        draw.rectangle([left, top, left + node.width, top + node.height], fill=fill, outline="black")
+        draw.multiline_text((left + PADDING, top + PADDING), "\n".join(node.label),
+                            fill="black", font=font, spacing=2)
+    img.save(path)
+
+
+def render_tree(tree, path, title="Search Tree"):
+    """Write the drawn tree to `path`; the format is taken from the extension (.svg or .png)."""
+    if str(path).endswith(".svg"):
+        write_svg(tree, path, title)
+    else:
+        write_png(tree, path, title)
+    return path
+
+
+def render_search_tree(root, path, title="Search Tree", max_children=4, max_nodes=200):
+    """Render a recorded search tree (SearchTreeNode root) to SVG/PNG."""
+    return render_tree(tree_from_search(root, max_children, max_nodes), path, title)
+
+
+def render_full_expansion(row_combinations, path, title="Full Nonogram Expansion Tree (No Pruning)",
+                          max_children=4, max_nodes=200):
+    """Render the unpruned row expansion tree to SVG/PNG without building it."""
+    return render_tree(tree_from_row_combinations(row_combinations, max_children, max_nodes), path, title)
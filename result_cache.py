@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# -------------------------------
+# Symmetry-canonical persistent result cache
+# -------------------------------
+# A puzzle and its 7 other dihedral variants (transposed, mirrored, rotated)
+# have the same solutions up to that transformation. canonical_form() picks
+# one representative clue set out of the 8, and ResultCache stores solved
+# grids in that orientation in an SQLite file, so a puzzle solved once is a
+# cache hit in every orientation, across runs and across processes.
+#
+# A transformation is a (transpose, flip_rows, flip_cols) triple applied in
+# that order: transpose the grid, then reverse the order of the rows, then
+# reverse every row.
+
+TRANSFORMS = [(transpose, flip_rows, flip_cols)
+              for transpose in (False, True) for flip_rows in (False, True) for flip_cols in (False, True)]
+
+
+def _clue(clue):
+    clue = tuple(clue)
+    return () if clue in ((), (0,)) else clue
+
+
+def transform_clues(row_clues, column_clues, transform):
+    """Return the (row_clues, column_clues) of the puzzle transformed by `transform`."""
+    transpose, flip_rows, flip_cols = transform
+    rows = tuple(_clue(clue) for clue in row_clues)
+    cols = tuple(_clue(clue) for clue in column_clues)
+    if transpose:
+        rows, cols = cols, rows
+    if flip_rows:
+        # Reversing the row order reverses every column.
+        rows = rows[::-1]
+        cols = tuple(clue[::-1] for clue in cols)
+    if flip_cols:
+        rows = tuple(clue[::-1] for clue in rows)
+        cols = cols[::-1]
+    return rows, cols
+
+
+def transform_grid(grid, transform):
+    transpose, flip_rows, flip_cols = transform
+    grid = [list(row) for row in grid]
+    if transpose:
+        grid = [list(col) for col in zip(*grid)]
+    if flip_rows:
+        grid = grid[::-1]
+    if flip_cols:
+        grid = [row[::-1] for row in grid]
+    return grid
+
+
+def untransform_grid(grid, transform):
+    """Inverse of transform_grid: the same steps undone in reverse order."""
+    transpose, flip_rows, flip_cols = transform
+    grid = [list(row) for row in grid]
+    if flip_cols:
+        grid = [row[::-1] for row in grid]
+    if flip_rows:
+        grid = grid[::-1]
+    if transpose:
+        grid = [list(col) for col in zip(*grid)]
+    return grid
+
+
+def canonical_form(row_clues, column_clues):
+    """
+    Return (canonical_clues, transform): the smallest of the 8 transformed clue
+    sets, and the transformation that maps this puzzle onto it.
+    """
+    best = None
+    for transform in TRANSFORMS:
+        clues = transform_clues(row_clues, column_clues, transform)
+        if best is None or clues < best[0]:
+            best = (clues, transform)
+    return best
+
+
+class ResultCache:
+    """
+    Size-bounded on-disk cache of definite results (solved or unsolvable),
+    keyed by the canonical clue set. SQLite in WAL mode makes it safe for
+    several batch workers to share one file; each process (and fork) opens its
+    own connection. Least recently used entries are evicted beyond max_entries.
+    """
+
+    def __init__(self, path="nonogram_results.sqlite", max_entries=100_000):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                               "key TEXT PRIMARY KEY, status TEXT, grid TEXT, last_used REAL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            connection.commit()
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def _key(canonical):
+        return json.dumps(canonical, separators=(",", ":"))
+
+    def get(self, row_clues, column_clues):
+        """Return (status, grid) in this puzzle's orientation, or None on a miss."""
+        canonical, transform = canonical_form(row_clues, column_clues)
+        key = self._key(canonical)
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT status, grid FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with connection:
+                connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        status, grid = row
+        grid = json.loads(grid)
+        return status, (untransform_grid(grid, transform) if grid is not None else None)
+
+    def put(self, row_clues, column_clues, status, grid):
+        canonical, transform = canonical_form(row_clues, column_clues)
+        stored = json.dumps(transform_grid(grid, transform)) if grid is not None else "null"
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                   (self._key(canonical), status, stored, time.time()))
+                excess = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    connection.execute("DELETE FROM results WHERE key IN "
+                                       "(SELECT key FROM results ORDER BY last_used LIMIT ?)", (excess,))
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM results")
+            self.hits = self.misses = 0
+
+    def info(self):
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
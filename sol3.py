@@ -1,45 +1,28 @@
-def solve_nonogram(col_clues, row_clues, size_m):
+from time import perf_counter
+
+from budget import current_budget
+from line_cache import line_candidates
+from metrics import current_metrics
+
+def solve_nonogram(col_clues, row_clues, size_m=None, verbose=False):
+    # The grid is len(row_clues) x len(col_clues); size_m is only kept for the
+    # old square call style. Set verbose to print every partial grid.
+    rows, cols = len(row_clues), len(col_clues)
+    # [0] means an empty line, which has no runs.
+    col_clues = [[] if clue == [0] else clue for clue in col_clues]
+
     # Generate all possible patterns for each row
     def generate_row_patterns(clue, length):
-        if not clue:
-            return [[0] * length]
-        if clue == [0]:
-            return [[0] * length]
-        
-        patterns = []
-        total_blocks = sum(clue) + len(clue) - 1
-        
-        if total_blocks > length:
-            return []
-        
-        def backtrack(current, block_idx, pos):
-            if block_idx == len(clue):
-                if len(current) == length:
-                    patterns.append(current.copy())
-                elif len(current) < length:
-                    patterns.append(current + [0] * (length - len(current)))
-                return
-            
-            block_len = clue[block_idx]
-            remaining_blocks = sum(clue[block_idx+1:]) + len(clue[block_idx+1:])
-            max_pos = length - remaining_blocks - block_len
-            
-            for p in range(pos, max_pos + 1):
-                new_current = current + [0] * (p - len(current)) + [1] * block_len
-                if block_idx < len(clue) - 1:
-                    new_current.append(0)  # mandatory space between blocks
-                backtrack(new_current, block_idx + 1, p + block_len + 1)
-        
-        backtrack([], 0, 0)
-        return patterns
+        # Served by the shared line cache, as 0/1 lists.
+        return [list(line) for line in line_candidates(clue, length)]
 
     # Generate all possible patterns for each row
-    row_patterns = [generate_row_patterns(clue, size_m) for clue in row_clues]
+    row_patterns = [generate_row_patterns(clue, cols) for clue in row_clues]
     
     # Check if current grid satisfies column clues
     def is_valid(grid):
-        for col_idx in range(size_m):
-            col = [grid[row_idx][col_idx] for row_idx in range(size_m)]
+        for col_idx in range(cols):
+            col = [grid[row_idx][col_idx] for row_idx in range(rows)]
             runs = []
             current = 0
             for cell in col:
@@ -56,25 +39,40 @@ def solve_nonogram(col_clues, row_clues, size_m):
 
     solution = []
     game_states = [0]  # Using list to allow modification in nested functions
+    metrics = current_metrics()
+    budget = current_budget()
 
     def backtrack(row_idx, grid):
-        if row_idx == size_m:
-            if is_valid(grid):
-                print(grid)
+        if row_idx == rows:
+            start = perf_counter() if metrics is not None else 0
+            solved = is_valid(grid)
+            if metrics is not None:
+                metrics.goal_test_time += perf_counter() - start
+            if solved:
+                if verbose:
+                    print(grid)
                 nonlocal solution
                 solution = [row.copy() for row in grid]
                 return True
             return False
-        print(grid)
+        if verbose:
+            print(grid)
+        if metrics is not None:
+            metrics.nodes_expanded += 1
+            metrics.frontier(row_idx + 1)
         
         for pattern in row_patterns[row_idx]:
-            new_grid = [row.copy() for row in grid]
+            start = perf_counter() if metrics is not None else 0
+            # Rows are replaced, never modified, so copying the row list is enough.
+            new_grid = grid[:]
             new_grid[row_idx] = pattern
             game_states[0] += 1
+            if budget is not None:
+                budget.tick()
             
             # Check column constraints up to current row
             valid = True
-            for col_idx in range(size_m):
+            for col_idx in range(cols):
                 col_so_far = [new_grid[i][col_idx] for i in range(row_idx + 1)]
                 runs = []
                 current = 0
@@ -84,6 +82,7 @@ def solve_nonogram(col_clues, row_clues, size_m):
                     elif current > 0:
                         runs.append(current)
                         current = 0
+                open_run = current > 0
                 if current > 0:
                     runs.append(current)
                 
@@ -93,36 +92,48 @@ def solve_nonogram(col_clues, row_clues, size_m):
                     valid = False
                     break
                 for i in range(len(runs)):
-                    if runs[i] != col_clue[i]:
+                    # A run that touches the current row may still grow.
+                    if runs[i] != col_clue[i] and not (open_run and i == len(runs) - 1 and runs[i] < col_clue[i]):
                         valid = False
                         break
+                if not valid:
+                    break
                 # Check if we have enough remaining cells for remaining blocks
-                remaining_cells = size_m - (row_idx + 1)
+                remaining_cells = rows - (row_idx + 1)
                 remaining_blocks = sum(col_clue[len(runs):]) + max(0, len(col_clue[len(runs):]) - 1)
+                if open_run:
+                    remaining_blocks += col_clue[len(runs) - 1] - runs[-1] + (1 if len(col_clue) > len(runs) else 0)
                 if remaining_blocks > remaining_cells:
                     valid = False
                     break
             
+            if metrics is not None:
+                metrics.consistency_checks += 1
+                metrics.successor_time += perf_counter() - start
+                if not valid:
+                    metrics.prune("column runs do not match clue prefix")
+            
             if valid and backtrack(row_idx + 1, new_grid):
                 return True
         
         return False
 
-    initial_grid = [[0 for _ in range(size_m)] for _ in range(size_m)]
+    initial_grid = [[0 for _ in range(cols)] for _ in range(rows)]
     backtrack(0, initial_grid)
     return solution, game_states[0]
 
-# Given clues
-column_clues = [[1], [2], [2], [2]]
-row_clues = [[1], [1, 1], [2], [2]]
-m = 4
+if __name__ == "__main__":
+    # Given clues
+    column_clues = [[1], [2], [2], [2]]
+    row_clues = [[1], [1, 1], [2], [2]]
+    m = 4
 
-solution, num_game_states = solve_nonogram(column_clues, row_clues, m)
+    solution, num_game_states = solve_nonogram(column_clues, row_clues, m, verbose=True)
 
-if solution:
-    print("Number of game states explored:", num_game_states)
-    print("Solution:")
-    for row in solution:
-        print(' '.join('#' if x == 1 else '.' for x in row))
-else:
-    print("No solution exists for the given clues.")
\ No newline at end of file
+    if solution:
+        print("Number of game states explored:", num_game_states)
+        print("Solution:")
+        for row in solution:
+            print(' '.join('#' if x == 1 else '.' for x in row))
+    else:
+        print("No solution exists for the given clues.")
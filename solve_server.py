@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import solver
+
+# -------------------------------
+# Local solving service
+# -------------------------------
+# A long-running asyncio server that answers JSON-lines requests on a Unix
+# socket or on localhost TCP. Each line is one puzzle:
+#
+#     {"id": 1, "row_clues": [[1], [3]], "column_clues": [[1], [2], [1]],
+#      "engine": "backtrack", "timeout": 1.0, "max_states": 100000}
+#
+# and each answer is one line with the same id and solver.SolveResult.to_dict()
+# fields (status, grid, stats), or {"id": ..., "error": ...}.
+#
+# Requests are solved in a process pool that is started and warmed up before
+# the first connection, so no request pays for Python startup or imports.
+# A client may pipeline: it can send many requests without waiting, and
+# answers are written as soon as they are ready, possibly out of order.
+# Backpressure: a connection has at most `max_inflight` requests in the pool;
+# beyond that the server stops reading from it, so the kernel socket buffers
+# fill up and slow the client down. Timeouts are passed to the engine as a
+# cooperative deadline; a request that still overruns it by `grace` seconds
+# is answered with status "timeout". A missing or null timeout means
+# `default_timeout`, so every job in the pool has a deadline.
+
+DEFAULT_ENGINE = "backtrack"
+
+
+def _warm_up():
+    # Runs in every worker so the first real request finds the engines imported.
+    solver.solve(([[1]], [[1]]), engine=DEFAULT_ENGINE)
+    return os.getpid()
+
+
+def _limit(request, key, default, integer=False):
+    """
+    Return request[key] as a positive float (a non-negative int if `integer`),
+    or `default` when it is missing or null. Raises ValueError otherwise.
+    """
+    value = request.get(key)
+    if value is None:
+        return default
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a number, not {value!r}") from None
+    if integer:
+        if not number.is_integer() or number < 0:
+            raise ValueError(f"{key} must be a non-negative integer, not {value!r}")
+        return int(number)
+    if not math.isfinite(number) or number <= 0:
+        raise ValueError(f"{key} must be a positive number of seconds, not {value!r}")
+    return number
+
+
+def _solve_request(request):
+    result = solver.solve(
+        request,
+        engine=request.get("engine", DEFAULT_ENGINE),
+        deadline=request.get("timeout"),
+        max_states=request.get("max_states"),
+    )
+    return result.to_dict()
+
+
+class SolveServer:
+    def __init__(self, workers=None, max_inflight=32, default_timeout=10.0, grace=1.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_inflight = max_inflight
+        self.default_timeout = default_timeout
+        self.grace = grace
+        self.pool = None
+        self.server = None
+        self.served = 0
+
+    async def start(self, path=None, host="127.0.0.1", port=0):
+        """Start the pool and listen on the Unix socket `path`, or on host:port."""
+        self.pool = ProcessPoolExecutor(self.workers)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _warm_up) for _ in range(self.workers)))
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host=host, port=port)
+        return self.server
+
+    @property
+    def address(self):
+        return self.server.sockets[0].getsockname()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            # Waits for the jobs already submitted; each one runs under its request's deadline.
+            self.pool.shutdown()
+
+    async def handle(self, reader, writer):
+        slots = asyncio.Semaphore(self.max_inflight)
+        write_lock = asyncio.Lock()
+        pending = set()
+        try:
+            while True:
+                # Wait for a free slot before reading the next request (backpressure).
+                await slots.acquire()
+                line = await reader.readline()
+                if not line:
+                    slots.release()
+                    break
+                task = asyncio.create_task(self._answer(line, writer, write_lock, slots))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        except (asyncio.CancelledError, ConnectionError):
+            # Server shutdown or client gone; in-flight answers have nowhere to go.
+            for task in pending:
+                task.cancel()
+        finally:
+            writer.close()
+
+    async def _answer(self, line, writer, write_lock, slots):
+        try:
+            response = await self._dispatch(line)
+            async with write_lock:
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            slots.release()
+
+    async def _dispatch(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as error:
+            return {"id": None, "error": f"bad request: {error}"}
+        if not isinstance(request, dict):
+            return {"id": None, "error": "bad request: expected a JSON object"}
+        request_id = request.get("id")
+        if "row_clues" not in request or "column_clues" not in request:
+            return {"id": request_id, "error": "bad request: row_clues and column_clues are required"}
+        try:
+            # Validated before the job is submitted, so a bad value cannot leave a worker without a deadline.
+            request["timeout"] = _limit(request, "timeout", self.default_timeout)
+            request["max_states"] = _limit(request, "max_states", None, integer=True)
+        except ValueError as error:
+            return {"id": request_id, "error": f"bad request: {error}"}
+        if request.get("engine", DEFAULT_ENGINE) not in solver.ENGINES:
+            return {"id": request_id, "error": f"unknown engine {request.get('engine')!r}"}
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.pool, _solve_request, request)
+        try:
+            response = await asyncio.wait_for(future, request["timeout"] + self.grace)
+        except asyncio.TimeoutError:
+            response = {"status": "timeout", "grid": None, "stats": None}
+        except Exception as error:
+            response = {"error": f"{type(error).__name__}: {error}"}
+        self.served += 1
+        response["id"] = request_id
+        return response
+
+
+# -------------------------------
+# Client helpers
+# -------------------------------
+
+async def open_client(path=None, host="127.0.0.1", port=None):
+    if path is not None:
+        return await asyncio.open_unix_connection(path)
+    return await asyncio.open_connection(host, port)
+
+
+async def solve_many(puzzles, path=None, host="127.0.0.1", port=None, **options):
+    """
+    Send every (row_clues, column_clues) pair on one pipelined connection and
+    return the answers in puzzle order. `options` (engine, timeout, max_states)
+    are added to every request.
+    """
+    reader, writer = await open_client(path, host, port)
+
+    async def send():
+        for i, (row_clues, column_clues) in enumerate(puzzles):
+            request = dict(options, id=i, row_clues=row_clues, column_clues=column_clues)
+            writer.write((json.dumps(request) + "\n").encode())
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    answers = [None] * len(puzzles)
+    for _ in range(len(puzzles)):
+        response = json.loads(await reader.readline())
+        answers[response["id"]] = response
+    await sender
+    writer.close()
+    await writer.wait_closed()
+    return answers
+
+
+# -------------------------------
+# Benchmark: server vs one process per puzzle
+# -------------------------------
+
+_SUBPROCESS_SCRIPT = """
+import sys, json
+import newcode
+row_clues, column_clues = json.loads(sys.argv[1])
+puzzle = newcode.NonogramPuzzle(row_clues, column_clues)
+node, explored, _ = newcode.recorded_astar_search(puzzle)
+print(json.dumps(node.state[1] if node else None))
+"""
+
+
+def _random_puzzle(rows, cols, seed):
+    rng = random.Random(seed)
+    grid = [[rng.random() < 0.6 for _ in range(cols)] for _ in range(rows)]
+
+    def clue(line):
+        runs, count = [], 0
+        for cell in line:
+            if cell:
+                count += 1
+            elif count:
+                runs.append(count)
+                count = 0
+        if count:
+            runs.append(count)
+        return runs or [0]
+
+    return [clue(row) for row in grid], [clue(col) for col in zip(*grid)]
+
+
+def benchmark(count=200, size=6, workers=None):
+    """Compare puzzles/second through the server with one `python -c newcode` run per puzzle."""
+    puzzles = [_random_puzzle(size, size, seed) for seed in range(count)]
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    subprocess_count = min(count, 20)
+    start = time.perf_counter()
+    for puzzle in puzzles[:subprocess_count]:
+        subprocess.run([sys.executable, "-c", _SUBPROCESS_SCRIPT, json.dumps(puzzle)],
+                       cwd=here, check=True, capture_output=True)
+    per_process = subprocess_count / (time.perf_counter() - start)
+
+    async def run():
+        service = SolveServer(workers)
+        await service.start(port=0)
+        host, port = service.address[:2]
+        start = time.perf_counter()
+        answers = await solve_many(puzzles, host=host, port=port, engine="astar")
+        elapsed = time.perf_counter() - start
+        await service.close()
+        return answers, elapsed
+
+    answers, elapsed = asyncio.run(run())
+    solved = sum(answer.get("status") == "solved" for answer in answers)
+    print(f"One process per puzzle: {per_process:8.1f} puzzles/s ({subprocess_count} puzzles)")
+    print(f"Solve server:           {count / elapsed:8.1f} puzzles/s ({count} puzzles, {solved} solved)")
+    print(f"Speed-up: {count / elapsed / per_process:.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON-lines nonogram solving service")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the server")
+    serve.add_argument("--socket", help="Unix socket path (default: localhost TCP)")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--workers", type=int)
+    serve.add_argument("--max-inflight", type=int, default=32)
+    bench = commands.add_parser("bench", help="benchmark against one process per puzzle")
+    bench.add_argument("--count", type=int, default=200)
+    bench.add_argument("--size", type=int, default=6)
+    bench.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.count, args.size, args.workers)
+        return
+
+    async def serve_forever():
+        service = SolveServer(args.workers, args.max_inflight)
+        server = await service.start(path=args.socket, port=args.port)
+        print(f"Serving on {args.socket or service.address} with {service.workers} workers")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve_forever())
+
+
+if __name__ == "__main__":
+    main()
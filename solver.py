@@ -0,0 +1,251 @@
+from time import perf_counter
+
+import bfs
+import dfs
+import local_search
+import newcode
+import oursol
+import oursol2
+import sol3
+from budget import SearchAborted, SearchBudget, bounded, current_budget
+from metrics import profile
+
+# -------------------------------
+# One entry point for every engine
+# -------------------------------
+# Each engine module has its own signature and clue/grid conventions.
+# solve() hides them behind a registry of adapters, which take
+# (row_clues, column_clues) and return (status, grid, states_explored) with
+# the grid as 0/1 lists, optionally followed by a dict of extra stats. Deadlines and state limits are enforced
+# cooperatively through budget.SearchBudget, which every engine ticks once
+# per explored state.
+#
+#     result = solve(([[1], [3], [1]], [[1], [3], [1]]), engine="astar", deadline=0.5)
+#     if result.solved:
+#         print(result.grid, result.stats["states_explored"])
+
+ENGINES = {}
+
+# Statuses an engine can finish with; SearchAborted adds its own reasons
+# ('timeout', 'state_limit', 'cancelled').
+SOLVED = "solved"
+UNSOLVABLE = "unsolvable"
+STALLED = "stalled"   # The propagation engine ran out of deductions
+PARTIAL = "partial"   # An anytime engine returned its best grid that is not a solution
+
+
+def register_engine(name):
+    """Decorator that adds an adapter to ENGINES under `name`."""
+    def decorator(adapter):
+        ENGINES[name] = adapter
+        return adapter
+    return decorator
+
+
+class SolveResult:
+    def __init__(self, status, grid, stats):
+        self.status = status    # SOLVED, UNSOLVABLE, STALLED, PARTIAL, or the SearchAborted reason
+        self.grid = grid        # List of 0/1 rows (possibly fewer than R when PARTIAL), or None
+        self.stats = stats      # engine, states_explored, wall_time (and metrics if collected)
+
+    @property
+    def solved(self):
+        return self.status == SOLVED
+
+    def to_dict(self):
+        return {"status": self.status, "grid": self.grid, "stats": self.stats}
+
+    def __repr__(self):
+        return f"SolveResult(status={self.status!r}, states_explored={self.stats['states_explored']})"
+
+
+def puzzle_clues(puzzle):
+    """
+    Return (row_clues, column_clues) from a NonogramPuzzle (or any object with
+    row_clues/column_clues), a dict with those keys, or a (row_clues, column_clues) pair.
+    """
+    if isinstance(puzzle, dict):
+        row_clues, column_clues = puzzle["row_clues"], puzzle["column_clues"]
+    elif hasattr(puzzle, "row_clues"):
+        row_clues, column_clues = puzzle.row_clues, puzzle.column_clues
+    else:
+        row_clues, column_clues = puzzle
+    return [list(clue) for clue in row_clues], [list(clue) for clue in column_clues]
+
+
+def _with_empty(clues, empty):
+    """Write empty-line clues as `empty` ([] or [0]), the form an engine compares against."""
+    return [list(empty) if clue in ([], [0]) else clue for clue in clues]
+
+
+def _binary(grid, filled):
+    return [[1 if cell == filled else 0 for cell in row] for row in grid]
+
+
+class _no_profile:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+def solve(puzzle, engine="backtrack", deadline=None, max_states=None, budget=None, collect_metrics=False,
+          cache=None):
+    """
+    Solve `puzzle` with the registered `engine`.
+    `deadline` is the wall time allowed, in seconds; `max_states` bounds the
+    states the engine may explore. Pass a SearchBudget as `budget` instead to
+    cancel the search from another thread with budget.cancel().
+    With collect_metrics, stats["metrics"] holds the engine's SolverMetrics.
+    With a result_cache.ResultCache as `cache`, definite results are looked up
+    and stored in symmetry-canonical form; a hit has stats["cache"] == "hit".
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}; choose from {', '.join(sorted(ENGINES))}")
+    row_clues, column_clues = puzzle_clues(puzzle)
+    if cache is not None:
+        start = perf_counter()
+        cached = cache.get(row_clues, column_clues)
+        if cached is not None:
+            status, grid = cached
+            stats = {"engine": engine, "states_explored": 0, "wall_time": perf_counter() - start, "cache": "hit"}
+            return SolveResult(status, grid, stats)
+    if budget is None:
+        budget = SearchBudget(deadline, max_states)
+    start = perf_counter()
+    with bounded(budget), profile(engine) if collect_metrics else _no_profile() as metrics:
+        try:
+            status, grid, states, *extra = ENGINES[engine](row_clues, column_clues)
+        except SearchAborted as aborted:
+            status, grid, states, extra = aborted.reason, None, aborted.states, ()
+    stats = {"engine": engine, "states_explored": states, "wall_time": perf_counter() - start}
+    for extra_stats in extra:
+        stats.update(extra_stats)
+    if metrics is not None:
+        stats["metrics"] = metrics.to_dict()
+    if cache is not None:
+        stats["cache"] = "miss"
+        # Aborted and stalled runs say nothing about the puzzle, so only definite results are kept.
+        if status in (SOLVED, UNSOLVABLE):
+            cache.put(row_clues, column_clues, status, grid)
+    return SolveResult(status, grid, stats)
+
+
+# -------------------------------
+# Engine adapters
+# -------------------------------
+
+class _DiscardTree:
+    """Exporter that drops recorded nodes, so the row searches keep no search tree."""
+
+    def add_node(self, node):
+        pass
+
+
+def _row_search(search):
+    def adapter(row_clues, column_clues):
+        puzzle = newcode.NonogramPuzzle(row_clues, _with_empty(column_clues, [0]))
+        node, states, _ = search(puzzle)
+        pruning = {"pruning_ratio": puzzle.pruning_ratio}
+        if node is None:
+            return UNSOLVABLE, None, states, pruning
+        return SOLVED, _binary(node.state[1], '#'), states, pruning
+    return adapter
+
+
+for _name, _search in [
+    ("bfs", lambda puzzle: newcode.recorded_breadth_first_search(puzzle, _DiscardTree())),
+    ("bfs-spill", newcode.capped_breadth_first_search),
+    ("dfs", lambda puzzle: newcode.recorded_depth_first_search(puzzle, _DiscardTree())),
+    ("ucs", lambda puzzle: newcode.recorded_uniform_cost_search(puzzle, _DiscardTree())),
+    ("ids", lambda puzzle: newcode.recorded_iterative_deepening_search(puzzle, _DiscardTree())),
+    ("greedy", lambda puzzle: newcode.recorded_greedy_search(puzzle, _DiscardTree())),
+    ("astar", lambda puzzle: newcode.recorded_astar_search(puzzle, _DiscardTree())),
+    ("idastar", newcode.iterative_deepening_astar_search),
+    ("bidirectional", newcode.bidirectional_search),
+]:
+    register_engine(_name)(_row_search(_search))
+
+
+@register_engine("beam")
+def _beam(row_clues, column_clues):
+    # Never aborts: when the budget runs out the best grid so far comes back as PARTIAL.
+    # Arc consistency may use half of the time left after candidate generation and
+    # then keeps the pruning done so far, so the search always gets time to run.
+    puzzle = newcode.NonogramPuzzle(row_clues, _with_empty(column_clues, [0]), arc_share=0.5)
+    node, violations, states = newcode.beam_search(puzzle)
+    if node is None:
+        return UNSOLVABLE, None, states
+    rows_filled, grid = node.state
+    status = SOLVED if violations == 0 and rows_filled == len(row_clues) else PARTIAL
+    return status, _binary(grid, '#'), states, {"violations": violations, "rows_filled": rows_filled,
+                                                "pruning_ratio": puzzle.pruning_ratio}
+
+
+@register_engine("anneal")
+def _anneal(row_clues, column_clues):
+    # Stochastic: only arc consistency, run before the annealing, can prove a puzzle unsolvable.
+    try:
+        grid, error, moves = local_search.simulated_annealing(row_clues, column_clues)
+    except ValueError:
+        return UNSOLVABLE, None, 0
+    status = SOLVED if error == 0 else PARTIAL
+    return status, _binary(grid, '#'), moves, {"column_error": error}
+
+
+@register_engine("backtrack")
+def _sol3(row_clues, column_clues):
+    grid, states = sol3.solve_nonogram(column_clues, row_clues)
+    if not grid and row_clues:
+        return UNSOLVABLE, None, states
+    return SOLVED, grid, states
+
+
+@register_engine("backtrack-all")
+def _oursol2(row_clues, column_clues):
+    # Enumerates every solution; the first one is returned.
+    solutions, states = oursol2.solve_nonogram(len(row_clues), row_clues, _with_empty(column_clues, [0]))
+    if not solutions:
+        return UNSOLVABLE, None, states
+    return SOLVED, _binary(solutions[0], '#'), states
+
+
+@register_engine("brute-force")
+def _oursol(row_clues, column_clues):
+    row_combinations = oursol.generate_all_row_combinations(row_clues, len(column_clues))
+    grids, states = oursol.generate_valid_grids(row_combinations, _with_empty(column_clues, [0]))
+    if not grids:
+        return UNSOLVABLE, None, states
+    return SOLVED, _binary(grids[0], '#'), states
+
+
+@register_engine("cell-bfs")
+def _bfs(row_clues, column_clues):
+    grid, states = bfs.solve_nonogram_bfs(_with_empty(column_clues, []), _with_empty(row_clues, []))
+    if grid is None:
+        return UNSOLVABLE, None, states
+    return SOLVED, grid, states
+
+
+@register_engine("cell-dfs")
+def _dfs(row_clues, column_clues):
+    grid, states = dfs.solve_nonogram(_with_empty(column_clues, []), _with_empty(row_clues, []))
+    # The grid is reset to unknown (-1) cells when the search fails.
+    if any(-1 in row for row in grid):
+        return UNSOLVABLE, None, states
+    return SOLVED, grid, states
+
+
+@register_engine("propagation")
+def _propagation(row_clues, column_clues):
+    # Imported here: onlinesolver pulls in numpy, which the other engines do not need.
+    from onlinesolver import NonogramSolver
+    try:
+        solver = NonogramSolver(row_clues, column_clues, show=False)
+    except ValueError:
+        # Contradictory clues; the solver object is lost, but solve() always sets a budget.
+        return UNSOLVABLE, None, current_budget().states
+    if not solver.solved:
+        return STALLED, None, solver.states_explored
+    return SOLVED, _binary(solver.board, 1), solver.states_explored
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+from array import array
+from collections import deque
+
+# -------------------------------
+# FIFO queue of index vectors with spill-to-disk
+# -------------------------------
+# A breadth-first frontier that does not fit in memory. Items are vectors of
+# non-negative ints (for the row search: the index of the option chosen in
+# each assigned row) stored as packed uint32 arrays. New items collect in an
+# in-memory tail; once the tail holds more than memory_cap bytes it is written
+# to a segment file and dropped. popleft() reads from an in-memory head, which
+# is refilled from the oldest segment file, or from the tail when no segment
+# is left, so items always come out in the order they went in:
+#
+#     head (oldest)  ->  segment files  ->  tail (newest)
+#
+# At most two segments' worth of items (head and tail) are in memory at once.
+
+_ENTRY_OVERHEAD = 40   # Rough per-item cost of a bytes object in a deque, beyond its data
+
+
+class SpillQueue:
+    def __init__(self, memory_cap=64 * 2**20, directory=None):
+        self.memory_cap = memory_cap
+        self._directory = directory
+        self._dir = None
+        self._head = deque()
+        self._head_bytes = 0
+        self._tail = deque()
+        self._tail_bytes = 0
+        self._segments = deque()        # (path, item count), oldest first
+        self._next_segment = 0
+        self._length = 0
+        self.segments_written = 0
+        self.bytes_spilled = 0
+        self.peak_memory_bytes = 0
+
+    def __len__(self):
+        return self._length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append(self, vector):
+        item = array('I', vector).tobytes()
+        self._tail.append(item)
+        self._tail_bytes += len(item) + _ENTRY_OVERHEAD
+        self._length += 1
+        memory = self._head_bytes + self._tail_bytes
+        if memory > self.peak_memory_bytes:
+            self.peak_memory_bytes = memory
+        if self._tail_bytes > self.memory_cap:
+            self._spill()
+
+    def popleft(self):
+        """Return the oldest vector as an array of ints. Raises IndexError when empty."""
+        if not self._head:
+            if self._segments:
+                self._load()
+            else:
+                self._head, self._tail = self._tail, deque()
+                self._head_bytes, self._tail_bytes = self._tail_bytes, 0
+        item = self._head.popleft()
+        self._head_bytes -= len(item) + _ENTRY_OVERHEAD
+        self._length -= 1
+        return array('I', item)
+
+    def _spill(self):
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix="bfs_frontier_", dir=self._directory)
+        path = os.path.join(self._dir, f"segment_{self._next_segment:06d}.bin")
+        self._next_segment += 1
+        # Each item is written as its length (a uint32 count of ints) followed by its data.
+        with open(path, mode='wb') as file:
+            for item in self._tail:
+                file.write(array('I', [len(item) // 4]).tobytes())
+                file.write(item)
+            self.bytes_spilled += file.tell()
+        self._segments.append((path, len(self._tail)))
+        self.segments_written += 1
+        self._tail = deque()
+        self._tail_bytes = 0
+
+    def _load(self):
+        path, count = self._segments.popleft()
+        with open(path, mode='rb') as file:
+            data = file.read()
+        os.remove(path)
+        offset = 0
+        for _ in range(count):
+            size = array('I', data[offset:offset + 4])[0] * 4
+            offset += 4
+            item = data[offset:offset + size]
+            offset += size
+            self._head.append(item)
+            self._head_bytes += size + _ENTRY_OVERHEAD
+        self.peak_memory_bytes = max(self.peak_memory_bytes, self._head_bytes + self._tail_bytes)
+
+    def close(self):
+        """Delete the segment files that were not read back."""
+        self._segments.clear()
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
@@ -0,0 +1,88 @@
+import json
+
+# -------------------------------
+# Streaming search tree export
+# -------------------------------
+
+class SearchTreeExporter:
+    """
+    Write search tree nodes and edges to a file as they are produced.
+
+    Supported formats are 'jsonl' (one JSON object per node, with its parent id)
+    and 'dot' (Graphviz). The format is taken from the file extension unless
+    given explicitly. Nodes deeper than max_depth, nodes past max_nodes and the
+    descendants of skipped nodes are not written, only counted in `skipped`.
+
+    The exporter can be passed to the recorded searches in newcode.py so that
+    nodes are streamed during the search instead of being kept in memory, or be
+    used afterwards with export_tree() on an already recorded tree.
+    """
+
+    def __init__(self, path, fmt=None, max_depth=None, max_nodes=None):
+        if fmt is None:
+            fmt = 'dot' if str(path).endswith(('.dot', '.gv')) else 'jsonl'
+        if fmt not in ('jsonl', 'dot'):
+            raise ValueError(f"Unknown export format: {fmt}")
+        self.fmt = fmt
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.nodes_written = 0
+        self.skipped = 0
+        self.file = open(path, mode='w')
+        if self.fmt == 'dot':
+            self.file.write("digraph SearchTree {\n  node [shape=box, fontname=\"monospace\"];\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.fmt == 'dot':
+            self.file.write("}\n")
+        self.file.close()
+
+    def add_node(self, node):
+        """
+        Write one node (and the edge from its parent).
+        Returns True if the node was written, False if it was skipped.
+        """
+        row_idx, grid = node.state
+        parent_id = getattr(node.parent, 'export_id', None) if node.parent is not None else None
+        if ((node.parent is not None and parent_id is None)
+                or (self.max_depth is not None and row_idx > self.max_depth)
+                or (self.max_nodes is not None and self.nodes_written >= self.max_nodes)):
+            self.skipped += 1
+            return False
+        node_id = self.nodes_written
+        node.export_id = node_id
+        self.nodes_written += 1
+        rows = ["".join(row) for row in grid]
+        if self.fmt == 'jsonl':
+            record = {"id": node_id, "parent": parent_id, "row_index": row_idx,
+                      "cost": node.cost, "grid": rows}
+            self.file.write(json.dumps(record) + "\n")
+        else:
+            label = "\\n".join([f"R{row_idx} | C{node.cost}"] + rows)
+            self.file.write(f"  n{node_id} [label=\"{label}\"];\n")
+            if parent_id is not None:
+                self.file.write(f"  n{parent_id} -> n{node_id};\n")
+        return True
+
+    def export_tree(self, root):
+        """Export an already recorded tree in pre-order, without recursion."""
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if self.add_node(node):
+                stack.extend(reversed(node.children))
+            else:
+                # Count the pruned subtree so `skipped` stays meaningful.
+                pending = list(node.children)
+                while pending:
+                    self.skipped += 1
+                    pending.extend(pending.pop().children)
+        return self.nodes_written